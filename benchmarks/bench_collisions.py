@@ -0,0 +1,92 @@
+# сравнение поочерёдной и векторной обработки столкновений
+# запуск из корня репозитория: python benchmarks/bench_collisions.py
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+from time import perf_counter
+
+import numpy as np
+
+from engine import PhysicsEntity, CollisionSystem, SpatialHashBroadphase
+from character_type import PhysicsStats
+from config import Settings
+from geometry.vector import Vector
+from world_store import WorldStore, BatchCollisionSystem
+
+SPRITE = "images/core1.png"
+STATIC_SHARE = 0.1
+
+
+def create_world(contacts_count: int, seed: int):
+    """Плотно расставленные сущности и не менее contacts_count пересекающихся пар"""
+    rnd = random.Random(seed)
+    entities = []
+    side = 40
+    while True:
+        while len(entities) < side * side // 4:
+            is_movable = rnd.random() > STATIC_SHARE
+            stats = PhysicsStats(mass=rnd.uniform(1, 20))
+            entity = PhysicsEntity(SPRITE, is_movable, stats=stats)
+            entity.set_position(Vector(rnd.uniform(0, side), rnd.uniform(0, side)) * 8)
+            entity.velocity = Vector(rnd.uniform(-0.1, 0.1), rnd.uniform(-0.1, 0.1))
+            entities.append(entity)
+        broadphase = SpatialHashBroadphase()
+        broadphase.rebuild(entities)
+        pairs = broadphase.get_pairs()
+        if len(pairs) >= contacts_count:
+            return entities, pairs[:contacts_count]
+        side = int(side * 1.3)
+
+
+def get_state(entities):
+    return np.array(
+        [
+            (*e.get_position().pair(), *e.velocity.pair())
+            for e in sorted(entities, key=lambda e: e.name)
+        ]
+    )
+
+
+def bench(contacts_count: int, seed: int = 0):
+    # поочерёдно
+    entities, pairs = create_world(contacts_count, seed)
+    for k, entity in enumerate(entities):
+        entity.name = k
+    start = perf_counter()
+    for obj1, obj2 in pairs:
+        CollisionSystem.handle_collision(obj1, obj2)
+    scalar_time = perf_counter() - start
+    scalar_state = get_state(entities)
+
+    # векторно (мир строится заново с тем же seed)
+    entities, pairs = create_world(contacts_count, seed)
+    for k, entity in enumerate(entities):
+        entity.name = k
+    store = WorldStore(len(entities))
+    for entity in entities:
+        store.attach(entity)
+    first = np.array([obj1.store_index for obj1, _ in pairs])
+    second = np.array([obj2.store_index for _, obj2 in pairs])
+    start = perf_counter()
+    BatchCollisionSystem.handle_collisions(store, first, second, Settings.dt())
+    batch_time = perf_counter() - start
+    batch_state = get_state(entities)
+
+    error = np.max(np.abs(scalar_state - batch_state))
+    return scalar_time, batch_time, error
+
+
+if __name__ == "__main__":
+    print(
+        f"{'contacts':>8} {'scalar, ms':>11} {'batch, ms':>10} {'speedup':>8} {'max error':>10}"
+    )
+    for contacts_count in [1000, 5000, 20000]:
+        scalar_time, batch_time, error = bench(contacts_count)
+        print(
+            f"{contacts_count:>8} {scalar_time * 1000:>11.2f} {batch_time * 1000:>10.2f} "
+            f"{scalar_time / batch_time:>8.2f} {error:>10.2e}"
+        )
@@ -0,0 +1,244 @@
+# набор замеров горячих участков движка, работает без дисплея
+# запуск из корня репозитория:
+#   python benchmarks/run.py --output results.json
+#   python benchmarks/run.py --compare results.json
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Dict, List
+
+import pygame as pg
+
+from engine import Player, Character, CollisionSystem
+from config import Settings, start_body
+from geometry.vector import Vector
+from character_type import GreenBacteria, CharacterStats
+from simulation import Simulation
+from game import GameScreen
+from bench_collisions import create_world
+
+BENCHMARKS: Dict[str, Callable[[int, int], Dict[str, float]]] = {}
+
+
+def benchmark(name: str):
+    """Регистрирует замер: func(count, repeat) -> метрики"""
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def count_vectors(func: Callable[[], None]) -> int:
+    """Количество Vector, созданных за вызов (основной источник мелких аллокаций)"""
+    created = 0
+    init = Vector.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal created
+        created += 1
+        init(self, *args, **kwargs)
+
+    Vector.__init__ = counting_init
+    try:
+        func()
+    finally:
+        Vector.__init__ = init
+    return created
+
+
+def measure(func: Callable[[], None], repeat: int) -> Dict[str, float]:
+    """Время одного вызова (среднее по repeat), пик выделенной памяти
+    и число созданных Vector за вызов"""
+    func()  # прогрев кэшей
+    start = perf_counter()
+    for _ in range(repeat):
+        func()
+    seconds = (perf_counter() - start) / repeat
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ms": seconds * 1000,
+        "alloc_peak_kib": peak / 1024,
+        "vectors_created": count_vectors(func),
+    }
+
+
+def create_game_screen(count: int) -> GameScreen:
+    """Экран игры с count персонажами в квадрате постоянной плотности вокруг игрока"""
+    player = Player(GreenBacteria, dict(start_body), name="player")
+    screen = GameScreen(player, pg.Surface((Settings.width, Settings.height)))
+    side = math.sqrt(count) * 60
+    simulation = Simulation()
+    simulation.populate(count, map_size=Vector(side, side), seed=0)
+    for entity in simulation.get_entities():
+        entity.shift_position(-Vector(side, side) / 2)
+        # препятствия отображаются через кэш неподвижных сущностей слоя
+        screen.add_entities_on_layer(
+            screen.LN.MAP, entity, is_static=not entity.is_movable
+        )
+    return screen
+
+
+@benchmark("process_entities")
+def bench_process_entities(count: int, repeat: int):
+    screen = create_game_screen(count)
+    result = measure(screen.process_entities, repeat)
+    result["ticks_per_sec"] = 1000 / result["ms"]
+    # фазы шага физики
+    physics = screen.physics
+    entities = screen.get_entities(screen.LN.MAP)
+    phases = {
+        "process": lambda: [entity.process() for entity in entities],
+        "broadphase": lambda: physics.broadphase.rebuild(entities),
+        "pairs": physics.broadphase.get_pairs,
+        "collisions": lambda: [
+            CollisionSystem.handle_pair(*pair)
+            for pair in physics.broadphase.get_pairs()
+        ],
+    }
+    for phase, func in phases.items():
+        result[f"{phase}_ms"] = measure(func, repeat)["ms"]
+    return result
+
+
+@benchmark("render")
+def bench_render(count: int, repeat: int):
+    screen = create_game_screen(count)
+    screen.process_entities()
+    return measure(screen.render, repeat)
+
+
+@benchmark("collision_handlers")
+def bench_collision_handlers(count: int, repeat: int):
+    _, pairs = create_world(count, seed=0)
+    handle = lambda: [CollisionSystem.handle_collision(*pair) for pair in pairs]
+    return measure(handle, repeat)
+
+
+@benchmark("vector")
+def bench_vector(count: int, repeat: int):
+    vectors = [Vector(i, -i) for i in range(count)]
+
+    def arithmetic():
+        acc = Vector()
+        for v in vectors:
+            acc += (v * 0.5 + acc / 2 - v).get_normalization()
+            abs(acc)
+
+    return measure(arithmetic, repeat)
+
+
+@benchmark("vector_inplace")
+def bench_vector_inplace(count: int, repeat: int):
+    """То же, что bench_vector, но на операциях без создания векторов"""
+    vectors = [Vector(i, -i) for i in range(count)]
+
+    def arithmetic():
+        acc = Vector()
+        tmp = Vector()
+        for v in vectors:
+            tmp.set(acc.x / 2, acc.y / 2).add_scaled(v, -0.5)
+            acc += tmp.normalize()
+            abs(acc)
+
+    return measure(arithmetic, repeat)
+
+
+@benchmark("stats_iadd_isub")
+def bench_stats(count: int, repeat: int):
+    part = CharacterStats(max_HP=10, speed=0.1, mass=2, scale_damage=1.1)
+
+    def add_sub():
+        stats = CharacterStats()
+        for _ in range(count):
+            stats += part
+            stats -= part
+
+    return measure(add_sub, repeat)
+
+
+@benchmark("character_construction")
+def bench_character_construction(count: int, repeat: int):
+    create = lambda: [Character(GreenBacteria) for _ in range(count)]
+    return measure(create, max(1, repeat // 10))
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(names: List[str], counts: List[int], repeat: int) -> Dict:
+    results = {}
+    for name in names:
+        for count in counts:
+            key = f"{name}[{count}]"
+            results[key] = BENCHMARKS[name](count, repeat)
+            print(key, " ".join(f"{k}={v:.3f}" for k, v in results[key].items()))
+    return {
+        "commit": get_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pygame": pg.version.ver,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(old: Dict, new: Dict) -> None:
+    """Печатает отношение новых времён к старым (< 1 - стало быстрее)"""
+    print(f"\n{old['commit']} -> {new['commit']}")
+    for key, metrics in new["results"].items():
+        if key not in old["results"]:
+            continue
+        for metric, value in metrics.items():
+            if not metric.endswith("ms"):
+                continue
+            old_value = old["results"][key].get(metric)
+            if old_value:
+                print(
+                    f"{key:>36} {metric:>14} {old_value:>10.3f} {value:>10.3f} "
+                    f"{value / old_value:>6.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры горячих участков движка")
+    parser.add_argument(
+        "--bench", nargs="*", default=list(BENCHMARKS), choices=list(BENCHMARKS)
+    )
+    parser.add_argument("--counts", nargs="*", type=int, default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    pg.init()
+    report = run(args.bench, args.counts, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
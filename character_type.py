@@ -1,10 +1,11 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from os.path import exists
 from collections import defaultdict
 from enum import Enum
 from copy import deepcopy
+from itertools import product
 from geometry.vector import Vector
-from typing import Dict, List, Type
+from typing import Dict, Iterable, List, Tuple, Type, Union
 
 # Части тела
 
@@ -18,6 +19,10 @@ class ChParts(Enum):
     BODY = "body"
 
 
+# (класс, класс другого слагаемого) -> пары (стат, "scale_" + стат) общих статов
+_STATS_LAYOUTS: Dict[Tuple[type, type], Tuple[Tuple[str, str], ...]] = {}
+
+
 @dataclass()
 class PhysicsStats:
     speed: float = 0
@@ -28,68 +33,93 @@ class PhysicsStats:
     scale_friction_coeff: float = 1
 
     def __post_init__(self):
-        for stat in self.absolute_stats:
-            setattr(self, stat, self._get_scale_stat(stat))
+        d = self.__dict__
+        for stat, scale_stat in self._get_layout():
+            d[stat] = d[stat] * d[scale_stat]
+
+    @classmethod
+    def _get_layout(cls, other_cls: type = None) -> Tuple[Tuple[str, str], ...]:
+        """Абсолютные статы, общие для cls и other_cls, вместе с их множителями.
+        Вычисляется один раз для каждой пары классов"""
+        key = (cls, other_cls)
+        layout = _STATS_LAYOUTS.get(key)
+        if layout is None:
+            names = [f.name for f in fields(cls)]
+            if other_cls is not None:
+                other_names = {f.name for f in fields(other_cls)}
+                names = [name for name in names if name in other_names]
+            layout = tuple(
+                (name, "scale_" + name)
+                for name in names
+                if not name.startswith("scale_")
+            )
+            _STATS_LAYOUTS[key] = layout
+        return layout
 
     @property
     def all_stats(self):
-        return list(vars(self).keys())
+        return [f.name for f in fields(self)]
 
     @property
     def absolute_stats(self):
-        return [stat for stat in vars(self).keys() if not stat.startswith("scale_")]
+        return [stat for stat, _ in self._get_layout()]
 
     @property
     def multiplying_stats(self):
-        return [
-            scale_stat
-            for scale_stat in vars(self).keys()
-            if scale_stat.startswith("scale_")
-        ]
-
-    def _get_scale_stat(self, stat: str):
-        scale_stat = "scale_" + stat
-        return getattr(self, stat) * getattr(self, scale_stat)
-
-    def _get_unscale_stat(self, stat: str):
-        scale_stat = "scale_" + stat
-        return getattr(self, stat) / getattr(self, scale_stat)
-
-    def _set_stat(self, stat: str, new_val: float):
-        setattr(self, stat, new_val)
+        return [scale_stat for _, scale_stat in self._get_layout()]
 
     def __iadd__(self, other: "PhysicsStats"):  # +=
-        general_stats = set(self.absolute_stats) & set(other.absolute_stats)
-        for stat in general_stats:
-            scale_stat = "scale_" + stat
+        d, o = self.__dict__, other.__dict__
+        for stat, scale_stat in self._get_layout(type(other)):
             # выделяю старые значения
-            s1, s2 = getattr(self, scale_stat), getattr(other, scale_stat)
-            c1 = self._get_unscale_stat(stat=stat)
-            c2 = other._get_unscale_stat(stat=stat)
-            # вычисляю новые значения
+            s1, s2 = d[scale_stat], o[scale_stat]
+            c1, c2 = d[stat] / s1, o[stat] / s2
+            # вычисляю и обновляю
             new_scale = s1 + s2 - 1
-            new_val = new_scale * (c1 + c2)
-            # обновляю данные
-            self._set_stat(scale_stat, new_scale)
-            self._set_stat(stat, new_val)
+            d[scale_stat] = new_scale
+            d[stat] = new_scale * (c1 + c2)
         return self
 
     def __isub__(self, other: "PhysicsStats"):  # -=
-        general_stats = set(self.absolute_stats) & set(other.absolute_stats)
-        for stat in general_stats:
-            scale_stat = "scale_" + stat
+        d, o = self.__dict__, other.__dict__
+        for stat, scale_stat in self._get_layout(type(other)):
             # выделяю старые значения
-            s1, s2 = getattr(self, scale_stat), getattr(other, scale_stat)
-            c1 = self._get_unscale_stat(stat=stat)
-            c2 = other._get_unscale_stat(stat=stat)
-            # вычисляю новые значения
+            s1, s2 = d[scale_stat], o[scale_stat]
+            c1, c2 = d[stat] / s1, o[stat] / s2
+            # вычисляю и обновляю
             new_scale = s1 - (s2 - 1)
-            new_val = new_scale * (c1 - c2)
-            # обновляю данные
-            self._set_stat(scale_stat, new_scale)
-            self._set_stat(stat, new_val)
+            d[scale_stat] = new_scale
+            d[stat] = new_scale * (c1 - c2)
         return self
 
+    @classmethod
+    def combine_many(
+        cls, combinations: Iterable[Iterable["PhysicsStats"]]
+    ) -> List["PhysicsStats"]:
+        """Для каждого набора частей - статы cls(), к которым прибавлены все части.
+        Сумма считается сразу: итоговый множитель 1 + sum(s - 1),
+        значение - множитель * сумма немасштабированных значений"""
+        layout = cls._get_layout()
+        base = cls().__dict__
+        results = []
+        for parts in combinations:
+            scales = {scale_stat: base[scale_stat] for _, scale_stat in layout}
+            values = {
+                stat: base[stat] / base[scale_stat] for stat, scale_stat in layout
+            }
+            for part in parts:
+                o = part.__dict__
+                for stat, scale_stat in cls._get_layout(type(part)):
+                    scales[scale_stat] += o[scale_stat] - 1
+                    values[stat] += o[stat] / o[scale_stat]
+            stats = cls()
+            d = stats.__dict__
+            for stat, scale_stat in layout:
+                d[scale_stat] = scales[scale_stat]
+                d[stat] = scales[scale_stat] * values[stat]
+            results.append(stats)
+        return results
+
 
 @dataclass()
 class CharacterStats(PhysicsStats):
@@ -113,8 +143,10 @@ class CharacterStats(PhysicsStats):
         return self
 
 
-@dataclass()
+@dataclass(frozen=True)
 class BodyPart:
+    """Неизменяемая часть тела, общая для всех персонажей (см. CharacterTypeCatalog)"""
+
     body_type: ChParts
     path_to_sprite: str
     indent: Vector
@@ -123,18 +155,22 @@ class BodyPart:
 
     def __post_init__(self):
         assert exists(self.path_to_sprite) and "не существует выбранного спрайта"
-        if self.body_type == ChParts.BODY:
-            self.z_index = 1
-        else:
-            self.z_index = 2
+        z_index = 1 if self.body_type == ChParts.BODY else 2
+        object.__setattr__(self, "z_index", z_index)
 
 
 # Типы тел
 
 
 class CharacterType:
+    """Набор частей тела. Экземпляры, используемые персонажами, берутся из
+    CharacterTypeCatalog и после создания не изменяются"""
+
     def __init__(self) -> None:
+        self.is_frozen = False
         self.parts: dict[ChParts, list[BodyPart]] = defaultdict(list)
+        # индексы частей (в порядке ChParts) -> итоговые статы, строится лениво
+        self._stats_table: dict[Tuple[int, ...], CharacterStats] = None
         self.add_core("core1.png", HP_regen_per_tick=0.001)
         self.add_core(
             "core2.png", HP_regen_per_tick=0.0015, scale_max_HP=1.2, scale_damage=1.2
@@ -161,6 +197,7 @@ class CharacterType:
     def _add_body_part(
         self, body_type: ChParts, name: str, indent=Vector(0, 0), **stats
     ):
+        assert not self.is_frozen and "тип персонажа из каталога не изменяется"
         self.parts[body_type].append(
             BodyPart(body_type, self._path + name, indent, CharacterStats(**stats))
         )
@@ -168,6 +205,26 @@ class CharacterType:
     def get_pasrts(self) -> Dict[Type[ChParts], List[Type[BodyPart]]]:
         return self.parts
 
+    def get_stats(self, selected: Tuple[int, ...]) -> CharacterStats:
+        """Итоговые статы набора частей, selected - индексы частей в порядке ChParts.
+        При первом вызове вычисляются статы всех сочетаний. Возвращается общий
+        объект таблицы, изменять его нельзя"""
+        if self._stats_table is None:
+            keys = list(product(*[range(len(self.parts[p])) for p in ChParts]))
+            combinations = [
+                [self.parts[p][i].stats for p, i in zip(ChParts, key)] for key in keys
+            ]
+            self._stats_table = dict(
+                zip(keys, CharacterStats.combine_many(combinations))
+            )
+        return self._stats_table[selected]
+
+    def freeze(self) -> None:
+        """Запрещает добавление частей, списки частей становятся кортежами"""
+        self.parts = {part_type: tuple(self.parts[part_type]) for part_type in ChParts}
+        self._stats_table = None
+        self.is_frozen = True
+
 
 class GreenBacteria(CharacterType):
     def __init__(self) -> None:
@@ -190,6 +247,34 @@ class RedBacteria(CharacterType):
         self.add_shell("RB_shell3.png", max_HP=40, damage=20, mass=10)
 
 
+# Каталог типов
+
+
+class CharacterTypeCatalog:
+    """Общий для процесса каталог: по одному неизменяемому экземпляру каждого типа"""
+
+    _types: dict[Type[CharacterType], CharacterType] = {}
+
+    @staticmethod
+    def get(character_type: Type[CharacterType]) -> CharacterType:
+        instance = CharacterTypeCatalog._types.get(character_type)
+        if instance is None:
+            assert (
+                character_type in CharacterTypeController.CHARACTER_TYPES
+                and "выбран несуществующий тип персонажа"
+            )
+            instance = character_type()
+            instance.freeze()
+            CharacterTypeCatalog._types[character_type] = instance
+        return instance
+
+    @staticmethod
+    def build() -> None:
+        """Создаёт все типы заранее (при запуске игры)"""
+        for character_type in CharacterTypeController.CHARACTER_TYPES:
+            CharacterTypeCatalog.get(character_type)
+
+
 # Управление телом
 
 
@@ -199,15 +284,19 @@ class CharacterTypeController:
         RedBacteria,
     ]
 
-    def __init__(self, character_type: CharacterType) -> None:
+    def __init__(
+        self, character_type: Union[CharacterType, Type[CharacterType]]
+    ) -> None:
         self.set_new_character_type(character_type)
 
-    def set_new_character_type(self, new_character_type: CharacterType):
-        assert (
-            type(new_character_type) in self.CHARACTER_TYPES
-            and "выбран несуществующий тип персонажа"
-        )
-        self.character_type = new_character_type
+    def set_new_character_type(
+        self, new_character_type: Union[CharacterType, Type[CharacterType]]
+    ):
+        """new_character_type - класс типа или его экземпляр,
+        в обоих случаях используется экземпляр из CharacterTypeCatalog"""
+        if isinstance(new_character_type, CharacterType):
+            new_character_type = type(new_character_type)
+        self.character_type = CharacterTypeCatalog.get(new_character_type)
         self.__selected_parts: dict[ChParts, int] = {}
         for part_type in ChParts:
             self.__selected_parts[part_type] = 0
@@ -230,6 +319,11 @@ class CharacterTypeController:
             parts[part_type] = self.get_all_parts()[part_type][part_ind]
         return parts
 
+    def get_selected_stats(self) -> CharacterStats:
+        """Статы выбранного набора частей из таблицы типа (общий объект, не изменять)"""
+        selected = tuple(self.__selected_parts[part_type] for part_type in ChParts)
+        return self.character_type.get_stats(selected)
+
     def __check_part(self, part_type, part_ind):
         assert part_type in self.__selected_parts and "неопознанная часть"
         assert (
@@ -41,6 +41,11 @@ class ScreenSettings:
 
     camera_speed = 1  # the speed of the camera keeping up with the player
     camera_zoom = 1
+    culling_margin = 32  # запас при отсечении по индексу (полоски HP и т.п.)
+    static_chunk_size = 512  # сторона фрагмента кэша неподвижных сущностей слоя
+    dirty_rects = True  # обновлять только изменившиеся области, пока камера стоит
+    dirty_rects_limit = 64  # больше областей - полная перерисовка
+    dirty_rects_max_share = 0.5  # доля площади экрана, после которой - полная перерисовка
 
 
 class GameSettings:
@@ -52,10 +57,14 @@ class GameSettings:
     default_button_color = Colors.silver
     bar_scale = 1.25
     bar_aspect_ratio = 8
+    scaled_images_cache_bytes = 64 * 1024 * 1024
+    text_surfaces_cache_size = 256  # записей в кэше отрисованного текста
+    fixed_dt = 1000 / FPS  # шаг физики (мс), не зависит от длительности кадра
+    max_substeps = 5  # максимум шагов физики за один кадр
 
     @staticmethod
     def dt():
-        return GameSettings.FPS_clock.get_time()
+        return GameSettings.fixed_dt
 
 
 class PhysicsSettings:
@@ -65,6 +74,14 @@ class PhysicsSettings:
     error = 0.001
     repulsion_force = 100
     energy_absorption = 0.1
+    broadphase = "grid"  # "grid" | "brute_force"
+    broadphase_cell_size = 64
+    use_world_store = False  # хранить состояние в массивах NumPy (world_store.py)
+    allow_sleeping = True  # неподвижные тела засыпают и не обрабатываются
+    sleep_velocity = error  # скорость, ниже которой тело считается неподвижным
+    sleep_ticks = 30  # тиков неподвижности до засыпания
+    continuous_collisions = True  # быстрые тела не проскакивают сквозь неподвижные
+    ccd_size_ratio = 0.5  # проверка, если сдвиг за шаг больше этой доли размера тела
 
     default_entity_physics_stats = PhysicsStats(
         speed=0,
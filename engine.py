@@ -1,6 +1,11 @@
 from abc import abstractmethod, ABC
+from bisect import insort
+from copy import copy
+from math import ceil, floor, inf
+from collections import defaultdict, OrderedDict
 from typing import Callable, Iterable, Union, List, Type, Tuple
-from os.path import exists
+from os.path import exists, normpath
+from time import perf_counter
 import pygame as pg
 from geometry.vector import Vector
 from config import Settings, Action
@@ -34,7 +39,8 @@ class IPhysicable(ABC):
         pass
 
     @abstractmethod
-    def process(self, entities: List[Type["IPhysicable"]]) -> None:
+    def process(self) -> None:
+        """Шаг сущности без учёта столкновений (их обрабатывает PhysicsSystem)"""
         pass
 
 
@@ -59,32 +65,135 @@ class IEventProcessable(ABC):
 
 
 class Model:
-    def __init__(self, elements_type=object) -> None:
+    """Контейнер элементов со стабильными целочисленными дескрипторами (handle).
+    Удаление - O(1), порядок обхода (порядок добавления) восстанавливается лениво.
+    name_key - функция имени элемента, если нужен поиск по имени"""
+
+    def __init__(
+        self, elements_type=object, name_key: Callable[[object], str] = None
+    ) -> None:
         self._elements_type = elements_type
         self._elements: list[self._elements_type] = []
+        self._is_outdated = False  # _elements нужно пересобрать после удаления
+        self._by_handle: dict[int, object] = {}
+        self._handles: dict[int, int] = {}  # id(элемента) -> handle
+        self._next_handle = 0
+        self._name_key = name_key
+        self._by_name: dict[str, dict[int, object]] = defaultdict(dict)
+        # очереди изменений, применяемые в flush
+        self._queued_add: list = []
+        self._queued_remove: dict[int, object] = {}
 
     def add(self, element):
+        """return: handle элемента (или список handle для набора)"""
         if isinstance(element, Iterable):
-            for e in element:
-                assert isinstance(e, self._elements_type) and "недобавляемый элемент"
-                self._elements.append(e)
-        elif isinstance(element, self._elements_type):
-            self._elements.append(element)
-        else:
-            assert False and "недобавляемый элемент"
+            return [self._add_element(e) for e in element]
+        return self._add_element(element)
+
+    def _add_element(self, element) -> int:
+        assert isinstance(element, self._elements_type) and "недобавляемый элемент"
+        assert id(element) not in self._handles and "элемент уже добавлен"
+        handle = self._next_handle
+        self._next_handle += 1
+        self._by_handle[handle] = element
+        self._handles[id(element)] = handle
+        if self._name_key is not None:
+            self._by_name[self._name_key(element)][handle] = element
+        if not self._is_outdated:
+            self._insert_element(element)
+        return handle
+
+    def _insert_element(self, element):
+        """Добавление в актуальный список обхода"""
+        self._elements.append(element)
+
+    def _rebuild_elements(self):
+        # список изменяется на месте: get_elements() может быть у вызывающего
+        self._elements[:] = self._by_handle.values()
 
     def get_elements(self):
+        if self._is_outdated:
+            self._rebuild_elements()
+            self._is_outdated = False
         return self._elements
 
+    def get_handle(self, element) -> int:
+        return self._handles[id(element)]
+
+    def get_by_handle(self, handle: int):
+        return self._by_handle[handle]
+
+    def has(self, element) -> bool:
+        return id(element) in self._handles
+
     def delete(self, index: int):
-        del self._elements[index]
+        self.remove(self.get_elements()[index])
 
     def remove(self, element):
-        self._elements.remove(element)
+        self.remove_by_handle(self._handles[id(element)])
+
+    def remove_by_handle(self, handle: int):
+        element = self._by_handle.pop(handle)
+        del self._handles[id(element)]
+        if self._name_key is not None:
+            name = self._name_key(element)
+            del self._by_name[name][handle]
+            if not self._by_name[name]:
+                del self._by_name[name]
+        self._is_outdated = True
 
     def modify(self, index: int, new_element):
+        """Заменяет элемент, сохраняя его handle и место"""
+        assert isinstance(new_element, self._elements_type) and "недобавляемый элемент"
+        old_element = self.get_elements()[index]
+        handle = self._handles.pop(id(old_element))
+        self._handles[id(new_element)] = handle
+        self._by_handle[handle] = new_element
+        if self._name_key is not None:
+            name = self._name_key(old_element)
+            del self._by_name[name][handle]
+            if not self._by_name[name]:
+                del self._by_name[name]
+            self._by_name[self._name_key(new_element)][handle] = new_element
         self._elements[index] = new_element
 
+    def has_by_name(self, name: str) -> bool:
+        assert self._name_key is not None and "поиск по имени не включён"
+        return name in self._by_name
+
+    def get_by_name(self, name: str):
+        """Первый добавленный элемент с заданным именем"""
+        assert self.has_by_name(name) and "поиск несуществующего объекта"
+        return next(iter(self._by_name[name].values()))
+
+    def remove_by_name(self, name: str):
+        """Удаляет первый добавленный элемент с заданным именем"""
+        if self.has_by_name(name):
+            self.remove_by_handle(next(iter(self._by_name[name])))
+
+    def queue_add(self, element):
+        """Отложенное добавление (элемент или набор), выполняется в flush"""
+        self._queued_add.append(element)
+
+    def queue_remove(self, element):
+        """Отложенное удаление, безопасно во время обхода get_elements()"""
+        self._queued_remove[id(element)] = element
+
+    def flush(self) -> list:
+        """Применяет очереди, return: удалённые элементы"""
+        removed = [e for e in self._queued_remove.values() if self.has(e)]
+        self._queued_remove = {}
+        for element in removed:
+            self.remove(element)
+        queued_add, self._queued_add = self._queued_add, []
+        for queued in queued_add:
+            self._add_queued(queued)
+        return removed
+
+    def _add_queued(self, queued):
+        """Добавление элемента из очереди queue_add"""
+        self.add(queued)
+
 
 # DISPLAYED ENTITIES
 
@@ -106,44 +215,65 @@ class Entity(pg.sprite.Sprite, IRenderable, IPositionable):
         self.set_position(position)
         self.sub_elements = SubElementModel()
 
-    @property
-    def center(self):
-        return self.get_position() + self.size / 2
-
-    @property
-    def left(self):
-        return self.get_position().x
-
-    @property
-    def right(self):
-        return self.get_position().x + self.size.x
-
-    @property
-    def top(self):
-        return self.get_position().y
-
-    @property
-    def bottom(self):
-        return self.get_position().y + self.size.y
-
     @property
     def is_exist(self):
         return True
 
+    def _update_geometry(self, position: Vector) -> None:
+        """Пересчитывает rect, границы (left, right, top, bottom) и center
+        при изменении положения или размера, чтобы их чтение было без вычислений"""
+        self.rect.left = int(position.x)
+        self.rect.top = int(position.y)
+        self.left = position.x
+        self.top = position.y
+        self.right = position.x + self.size.x
+        self.bottom = position.y + self.size.y
+        self.center = Vector(position.x + self.size.x / 2, position.y + self.size.y / 2)
+
     def set_position(self, new_position: Vector) -> None:
         self.__position = self._indent + new_position
-        self.rect.left = int(self.__position.x)
-        self.rect.top = int(self.__position.y)
+        self._update_geometry(self.__position)
+
+    def set_size(self, new_size: Vector) -> None:
+        self.size = new_size
+        self.rect.width = int(new_size.x)
+        self.rect.height = int(new_size.y)
+        self._update_geometry(self.get_position())
 
     def set_indent(self, new_indent: Vector) -> None:
         self._indent = new_indent
 
     def shift_position(self, delta_position: Vector) -> None:
-        self.set_position(self.__position + delta_position)
+        self.set_position(self.get_position() + delta_position)
 
     def get_position(self):
         return self.__position
 
+    def get_interpolation_shift(self, alpha: float) -> Vector:
+        """Смещение для отрисовки между шагами физики, alpha - доля следующего шага.
+        None, если сущность не нужно интерполировать"""
+        return None
+
+    def get_bounding_rect(self) -> pg.Rect:
+        """rect сущности вместе со всеми подэлементами"""
+        rect = self.rect
+        for el in self.sub_elements.get_elements():
+            el.update_position()
+            rect = rect.union(el.get_sub_entity().get_bounding_rect())
+        return rect
+
+    def get_render_key(self) -> tuple:
+        """Внешний вид сущности без учёта положения. Если он не изменился и сущность
+        не сдвинулась на экране, перерисовывать её не нужно"""
+        return (
+            self.color,
+            self.size.pair(),
+            tuple(
+                el.get_sub_entity().get_render_key()
+                for el in self.sub_elements.get_elements()
+            ),
+        )
+
     def update(
         self,
         screen_surface: pg.Surface,
@@ -156,17 +286,6 @@ class Entity(pg.sprite.Sprite, IRenderable, IPositionable):
         rect = pg.Rect(*position_on_screen.pair(), *size.pair())
         pg.draw.rect(screen_surface, self.color, rect)
 
-    @staticmethod
-    def collide_entities(
-        entity, entities: List[Type["Entity"]]
-    ) -> List[Type["Entity"]]:
-        """entities: сущности с которыми может пересекаться объект
-        return: сущности с которыми пересекается объект (исключая себя)"""
-        collide_group = pg.sprite.spritecollide(entity, entities, False)
-        if entity in collide_group:
-            collide_group.remove(entity)
-        return collide_group
-
 
 class SubElement(IRenderable):
     def __init__(
@@ -206,15 +325,20 @@ class SubElement(IRenderable):
 
 class SubElementModel(Model, IRenderable):
     def __init__(self) -> None:
-        super().__init__(elements_type=SubElement)
+        super().__init__(
+            elements_type=SubElement, name_key=lambda el: el.get_sub_entity().name
+        )
         self._elements: list[SubElement]
 
-    def add(self, element: SubElement):
-        super().add(element=element)
-        self._elements = sorted(self._elements, key=lambda se: se.z_index)
+    def _insert_element(self, element: SubElement):
+        # после элементов с тем же z_index, как при устойчивой сортировке
+        insort(self._elements, element, key=lambda se: se.z_index)
+
+    def _rebuild_elements(self):
+        self._elements[:] = sorted(self._by_handle.values(), key=lambda se: se.z_index)
 
     def update_position(self):
-        for entity in self._elements:
+        for entity in self.get_elements():
             entity.update_position()
 
     def update(
@@ -224,31 +348,15 @@ class SubElementModel(Model, IRenderable):
         zoom: float,
     ):
         self.update_position()
-        for entity in self._elements:
+        for entity in self.get_elements():
             entity.update(
                 screen_surface=screen_surface,
                 convert_position=convert_position,
                 zoom=zoom,
             )
 
-    def has_by_name(self, name: str):
-        for el in self._elements:
-            if el.get_sub_entity().name == name:
-                return True
-        return False
-
-    def remove_by_name(self, name: str):
-        """Удаляет первый элемент с заданным именем"""
-        for el in self._elements:
-            if el.get_sub_entity().name == name:
-                self.remove(el)
-                break
-
     def get_by_name(self, name: str):
-        for el in self._elements:
-            if el.get_sub_entity().name == name:
-                return el.get_sub_entity()
-        assert False and "поиск несуществующего объекта"
+        return super().get_by_name(name).get_sub_entity()
 
 
 class Bar(Entity):
@@ -291,7 +399,12 @@ class Bar(Entity):
 
     def update_load(self, percent: float):
         self.__percent = max(0, min(percent, 1))
-        self.movable_bar.size.x = self.__percent * (self.size.x - 2 * self.indent.x)
+        self.movable_bar.set_size(
+            Vector(
+                self.__percent * (self.size.x - 2 * self.indent.x),
+                self.movable_bar.size.y,
+            )
+        )
 
     @staticmethod
     def create_bar(length: float):
@@ -299,6 +412,227 @@ class Bar(Entity):
         return Bar(size=bar_size)
 
 
+class PerformanceOverlay(Entity):
+    """Текстовая панель с временем фаз и счётчиками последнего кадра (режим разработчика)"""
+
+    def __init__(
+        self,
+        frame_stats: "FrameStats",
+        position=Vector(0, 0),
+        name="PerformanceOverlay",
+        font_size: int = 16,
+        color: Tuple[int] = Colors.white,
+    ) -> None:
+        self.font_size = font_size
+        self.font = FontCache.get(None, font_size)
+        self.frame_stats = frame_stats
+        self.text_color = color
+        super().__init__(Vector(0, 0), position, name, Colors.black)
+
+    def get_render_key(self) -> tuple:
+        if not self.frame_stats.enabled:
+            return ()
+        return tuple(self.get_lines())
+
+    def get_bounding_rect(self) -> pg.Rect:
+        """Собственный размер панели нулевой, rect закрывает весь текст"""
+        lines = self.get_lines() if self.frame_stats.enabled else []
+        width = max((self.font.size(line)[0] for line in lines), default=0)
+        height = len(lines) * self.font.get_linesize()
+        return pg.Rect(self.rect.x, self.rect.y, width, height)
+
+    def get_lines(self) -> List[str]:
+        stats = self.frame_stats
+        lines = [f"{phase}: {ms:.2f} ms" for phase, ms in stats.last_times.items()]
+        lines += [f"{name}: {value}" for name, value in stats.last_counters.items()]
+        return lines
+
+    def update(
+        self,
+        screen_surface: pg.Surface,
+        convert_position: Callable[[Vector], Vector],
+        zoom: float,
+    ):
+        if not self.frame_stats.enabled:
+            return
+        position = convert_position(self.get_position())
+        line_height = self.font.get_linesize()
+        for i, line in enumerate(self.get_lines()):
+            text = TextCache.get(
+                line, None, self.font_size, self.text_color, self.color
+            )
+            screen_surface.blit(text, (position.x, position.y + i * line_height))
+
+
+class ImageCache:
+    """Общий для процесса кэш изображений: путь -> Surface.
+    Используется RasterEntity и, через неё, Obstacle и частями тела Character"""
+
+    _images: dict[str, pg.Surface] = {}
+    _unconverted: set[str] = set()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def get(path2image: str) -> pg.Surface:
+        key = normpath(path2image)
+        image = ImageCache._images.get(key)
+        if image is None:
+            ImageCache.misses += 1
+            assert exists(path2image) and "несуществующий спрайт"
+            image = pg.image.load(path2image)
+            ImageCache._unconverted.add(key)
+        else:
+            ImageCache.hits += 1
+        # convert_alpha возможен только после создания окна
+        if key in ImageCache._unconverted and pg.display.get_surface() is not None:
+            image = image.convert_alpha()
+            ImageCache._unconverted.discard(key)
+        ImageCache._images[key] = image
+        return image
+
+    @staticmethod
+    def clear() -> None:
+        ImageCache._images.clear()
+        ImageCache._unconverted.clear()
+        ImageCache.hits = 0
+        ImageCache.misses = 0
+
+
+class CompositeImageCache:
+    """Общий для процесса кэш составных изображений: слои -> (Surface, смещение).
+    Слой - (путь к изображению, отступ от позиции сущности), слои накладываются
+    по порядку. Смещение - положение поверхности относительно позиции сущности"""
+
+    _images: dict[tuple, Tuple[pg.Surface, Vector]] = {}
+
+    @staticmethod
+    def get(
+        layers: Tuple[Tuple[str, Tuple[float, float]], ...],
+    ) -> Tuple[pg.Surface, Vector]:
+        composite = CompositeImageCache._images.get(layers)
+        if composite is None:
+            composite = CompositeImageCache._compose(layers)
+            CompositeImageCache._images[layers] = composite
+        return composite
+
+    @staticmethod
+    def _compose(
+        layers: Tuple[Tuple[str, Tuple[float, float]], ...],
+    ) -> Tuple[pg.Surface, Vector]:
+        images = [(ImageCache.get(path), Vector(*indent)) for path, indent in layers]
+        left = floor(min(indent.x for _, indent in images))
+        top = floor(min(indent.y for _, indent in images))
+        right = max(indent.x + image.get_width() for image, indent in images)
+        bottom = max(indent.y + image.get_height() for image, indent in images)
+        surface = pg.Surface((ceil(right - left), ceil(bottom - top)), pg.SRCALPHA)
+        for image, indent in images:
+            surface.blit(image, (indent.x - left, indent.y - top))
+        if pg.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        return surface, Vector(left, top)
+
+    @staticmethod
+    def clear() -> None:
+        CompositeImageCache._images.clear()
+
+
+class ScaledImageCache:
+    """LRU-кэш масштабированных изображений: (Surface, ширина, высота) -> Surface.
+    Размер ограничен Settings.scaled_images_cache_bytes, сбрасывается при смене zoom"""
+
+    _images: OrderedDict = OrderedDict()
+    used_bytes = 0
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def get(image: pg.Surface, size: Vector) -> pg.Surface:
+        # pg.transform.scale отбрасывает дробную часть размера
+        key = (image, int(size.x), int(size.y))
+        scaled = ScaledImageCache._images.get(key)
+        if scaled is not None:
+            ScaledImageCache.hits += 1
+            ScaledImageCache._images.move_to_end(key)
+            return scaled
+        ScaledImageCache.misses += 1
+        scaled = pg.transform.scale(image, key[1:])
+        ScaledImageCache._images[key] = scaled
+        ScaledImageCache.used_bytes += ScaledImageCache._get_bytes(scaled)
+        while ScaledImageCache.used_bytes > Settings.scaled_images_cache_bytes:
+            _, old = ScaledImageCache._images.popitem(last=False)
+            ScaledImageCache.used_bytes -= ScaledImageCache._get_bytes(old)
+        return scaled
+
+    @staticmethod
+    def _get_bytes(image: pg.Surface) -> int:
+        return image.get_width() * image.get_height() * image.get_bytesize()
+
+    @staticmethod
+    def clear() -> None:
+        ScaledImageCache._images.clear()
+        ScaledImageCache.used_bytes = 0
+
+
+class FontCache:
+    """Общий для процесса кэш шрифтов: (путь к шрифту, размер) -> Font.
+    Файл шрифта читается с диска один раз"""
+
+    _fonts: dict[Tuple[str, int], pg.font.Font] = {}
+
+    @staticmethod
+    def get(path2font: Union[str, None], size: int) -> pg.font.Font:
+        key = (path2font, size)
+        font = FontCache._fonts.get(key)
+        if font is None:
+            if not pg.font.get_init():
+                pg.font.init()
+            font = pg.font.Font(path2font, size)
+            FontCache._fonts[key] = font
+        return font
+
+    @staticmethod
+    def clear() -> None:
+        FontCache._fonts.clear()
+
+
+class TextCache:
+    """LRU-кэш отрисованного текста: (текст, шрифт, размер, цвет, фон) -> Surface.
+    Размер ограничен Settings.text_surfaces_cache_size записями"""
+
+    _surfaces: OrderedDict = OrderedDict()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def get(
+        text: str,
+        path2font: Union[str, None],
+        size: int,
+        color: Tuple[int],
+        background: Tuple[int] = None,
+    ) -> pg.Surface:
+        key = (text, path2font, size, tuple(color), background and tuple(background))
+        surface = TextCache._surfaces.get(key)
+        if surface is not None:
+            TextCache.hits += 1
+            TextCache._surfaces.move_to_end(key)
+            return surface
+        TextCache.misses += 1
+        font = FontCache.get(path2font, size)
+        surface = font.render(text, True, color, background)
+        TextCache._surfaces[key] = surface
+        while len(TextCache._surfaces) > Settings.text_surfaces_cache_size:
+            TextCache._surfaces.popitem(last=False)
+        return surface
+
+    @staticmethod
+    def clear() -> None:
+        TextCache._surfaces.clear()
+        TextCache.hits = 0
+        TextCache.misses = 0
+
+
 class RasterEntity(Entity):
     def __init__(
         self,
@@ -316,8 +650,7 @@ class RasterEntity(Entity):
         )
 
     def __set_image(self, path2image: str):
-        assert exists(path2image) and "несуществующий спрайт"
-        self.image = pg.image.load(path2image)
+        self.image = ImageCache.get(path2image)
 
     def update(
         self,
@@ -334,7 +667,7 @@ class RasterEntity(Entity):
                 convert_position=convert_position,
                 zoom=zoom,
             )
-        image = pg.transform.scale(self.image, size.pair())
+        image = ScaledImageCache.get(self.image, size)
         screen_surface.blit(image, position_on_screen.pair())
 
 
@@ -353,9 +686,68 @@ class PhysicsEntity(RasterEntity, IPhysicable):
     ) -> None:
         self.stats = stats
         self.is_movable = is_movable
+        # спящее тело не движется и не ищет столкновений, пока его не разбудят
+        self.is_sleeping = False
+        self.still_ticks = 0
+        # WorldStore, если положение и скорость хранятся в массивах
+        self.store = None
+        self.store_index = -1
         self.velocity = Vector(0, 0)
+        self.previous_position: Vector = None
         super().__init__(path2image=path2image, position=position, name=name)
 
+    def attach_store(self, store, index: int) -> None:
+        """Вызывается WorldStore.attach, данные уже скопированы в массивы"""
+        self.store = store
+        self.store_index = index
+
+    def detach_store(self, position: Vector, velocity: Vector) -> None:
+        """Вызывается WorldStore.detach, возвращает данные из массивов в сущность"""
+        self.store = None
+        self.store_index = -1
+        self.velocity = velocity
+        super().set_position(position - self._indent)
+
+    @property
+    def velocity(self) -> Vector:
+        if self.store is None:
+            return self._velocity
+        return self.store.get_velocity(self.store_index)
+
+    @velocity.setter
+    def velocity(self, new_velocity: Vector) -> None:
+        if self.store is None:
+            self._velocity = new_velocity
+        else:
+            self.store.set_velocity(self.store_index, new_velocity)
+
+    def get_position(self):
+        if self.store is None:
+            return super().get_position()
+        return self.store.get_position(self.store_index)
+
+    def set_position(self, new_position: Vector) -> None:
+        if self.is_sleeping:
+            self.wake_up()
+        if self.store is None:
+            super().set_position(new_position)
+            return
+        self.store.set_position(self.store_index, self._indent + new_position)
+        self.update_rect()
+
+    def update_rect(self) -> None:
+        """Синхронизирует rect и границы с положением (после изменения массивов WorldStore)"""
+        self._update_geometry(self.get_position())
+
+    def set_size(self, new_size: Vector) -> None:
+        super().set_size(new_size)
+        self.update_store_stats()
+
+    def update_store_stats(self) -> None:
+        """Копирует размер, массу и трение в WorldStore, вызывается после их изменения"""
+        if self.store is not None:
+            self.store.pull_entity_stats(self)
+
     def get_collision_objs_pipeline(self) -> List[Callable[..., None]]:
         return [
             CollisionSystem.handle_collision,
@@ -365,6 +757,26 @@ class PhysicsEntity(RasterEntity, IPhysicable):
     def is_static(self) -> bool:
         return not self.is_movable
 
+    @property
+    def is_awake(self) -> bool:
+        """Подвижная и не спящая сущность: только она ищет столкновения"""
+        return self.is_movable and not self.is_sleeping
+
+    def wake_up(self) -> None:
+        self.is_sleeping = False
+        self.still_ticks = 0
+
+    def update_sleep(self) -> None:
+        """Вызывается после шага физики: тело засыпает, если его скорость
+        не больше Settings.sleep_velocity Settings.sleep_ticks тиков подряд"""
+        if abs(self.v) > Settings.sleep_velocity:
+            self.still_ticks = 0
+            return
+        self.still_ticks += 1
+        if self.still_ticks >= Settings.sleep_ticks:
+            self.velocity = Vector(0, 0)
+            self.is_sleeping = True
+
     @property
     def m(self) -> float:
         return self.stats.mass
@@ -381,6 +793,11 @@ class PhysicsEntity(RasterEntity, IPhysicable):
     def friction_coeff(self):
         return self.stats.friction_coeff
 
+    @property
+    def total_friction_coeff(self) -> float:
+        """Коэффициент трения, применяемый за шаг"""
+        return Settings.friction_coefficient
+
     def move_position(self, delta_position: Vector) -> None:
         self.shift_position(delta_position * Settings.dt())
 
@@ -397,14 +814,23 @@ class PhysicsEntity(RasterEntity, IPhysicable):
             velocity *= Settings.max_speed / abs(velocity)
         self.move_position(velocity)
 
-    def process(self, entities: List[Type["PhysicsEntity"]]) -> None:
-        if self.is_movable:
+    def get_interpolation_shift(self, alpha: float) -> Vector:
+        if self.is_static or self.previous_position is None:
+            return None
+        return (self.previous_position - self.get_position()) * (1 - alpha)
+
+    def process(self) -> None:
+        # set_position всегда создаёт новый вектор, поэтому копия не нужна
+        self.previous_position = self.get_position()
+        if self.is_sleeping:
+            # будит только скорость, заданная извне (управление, ИИ)
+            if abs(self.v) <= Settings.sleep_velocity:
+                return
+            self.wake_up()
+        # при наличии WorldStore движение выполняется векторно в WorldStore.step
+        if self.is_movable and self.store is None:
             self.apply_friction(Settings.friction_coefficient)
             self.move(self.v)
-        # проверка коллизий
-        for entity in Entity.collide_entities(self, entities):
-            for callback in self.get_collision_objs_pipeline():
-                callback(self, entity)
 
     def apply_friction(self, friction_coefficient: float) -> None:
         """Применение силы трения к объекту"""
@@ -428,13 +854,15 @@ class Obstacle(PhysicsEntity):
 class Character(PhysicsEntity):
     def __init__(
         self,
-        character_type: CharacterType,
+        character_type: Union[CharacterType, Type[CharacterType]],
         position=Vector(0, 0),
         name="Character",
     ) -> None:
+        """character_type - класс типа (например, GreenBacteria) или его экземпляр"""
         self.CTC = CharacterTypeController(character_type)
+        self.__body_path = self.CTC.get_selected_parts()[ChParts.BODY].path_to_sprite
         super().__init__(
-            path2image=self.CTC.get_selected_parts()[ChParts.BODY].path_to_sprite,
+            path2image=self.__body_path,
             is_movable=True,
             position=position,
             name=name,
@@ -445,32 +873,58 @@ class Character(PhysicsEntity):
 
     def __set_body_parts(self):
         self.__parts: dict[ChParts, BodyPart] = {}
-        self.stats = CharacterStats()
+        # части тела не рисуются по отдельности, а запекаются в self.__composite
+        self.__body_parts = SubElementModel()
+        self.stats = copy(self.CTC.get_selected_stats())
         for part_type, part in self.CTC.get_selected_parts().items():
             self.__set_body_part(part_type, part)
+        self.__compose()
 
     def __set_body_part(self, part_type: ChParts, part: BodyPart):
         # удаляю предыдущую часть тела
         if part_type in self.__parts:
-            self.stats -= self.__parts[part_type].stats
-            self.sub_elements.remove_by_name(part_type.value)
+            self.__body_parts.remove_by_name(part_type.value)
         # добавляю новую часть тела
-        self.stats += part.stats
         self.__parts[part_type] = part
         part_entity = RasterEntity(part.path_to_sprite, name=part_type.value)
-        self.sub_elements.add(SubElement(self, part_entity, z_index=part.z_index))
+        self.__body_parts.add(SubElement(self, part_entity, z_index=part.z_index))
         if part_type == ChParts.CORE:
             part_entity.set_indent(part.indent + (self.size - part_entity.size) / 2)
         else:
             part_entity.set_indent(part.indent)
 
+    def __compose(self):
+        """Тело и выбранные части тела (в порядке z_index) в одной поверхности.
+        Персонажи с одинаковым набором частей используют общую поверхность"""
+        layers = [(self.__body_path, (0, 0))]
+        for el in self.__body_parts.get_elements():
+            part_type = ChParts(el.get_sub_entity().name)
+            indent = el.get_sub_entity()._indent
+            layers.append((self.__parts[part_type].path_to_sprite, indent.pair()))
+        self.__composite, self.__composite_offset = CompositeImageCache.get(
+            tuple(layers)
+        )
+
     def __set_body_part_by_index(self, part_type: ChParts, part_ind: int):
         part = self.CTC.get_all_parts()[part_type][part_ind]
         self.__set_body_part(part_type, part)
 
     def change_body_part(self, part_type: ChParts, part_ind: int):
+        prev_stats = self.CTC.get_selected_stats()
         self.CTC.set_parts({part_type: part_ind})
         self.__set_body_part_by_index(part_type, part_ind)
+        self.__compose()
+        self.__update_stats(prev_stats)
+
+    def __update_stats(self, prev_stats: CharacterStats):
+        """Статы берутся из таблицы типа. Прибавка HP от новых частей сохраняется,
+        а потеря не опускает HP ниже текущего (ограниченного новым max_HP)"""
+        new_stats = self.CTC.get_selected_stats()
+        HP = self.HP + new_stats.HP - prev_stats.HP
+        HP = min(max(HP, min(self.HP, new_stats.max_HP)), new_stats.max_HP)
+        self.stats = copy(new_stats)
+        self.stats.HP = HP
+        self.update_store_stats()
 
     def __set_HP_bar(self):
         self.HPbar = Bar.create_bar(self.size.x * Settings.bar_scale)
@@ -511,11 +965,11 @@ class Character(PhysicsEntity):
             CollisionSystem.handle_attack,
         ]
 
-    def process(self, entities: List[Type[PhysicsEntity]]):
+    def process(self):
         self.process_effects()
         self.process_motion_intent()
         self.process_HP_regen()
-        super().process(entities)
+        super().process()
 
     def process_HP_regen(self):
         self.stats.HP += self.stats.HP_regen_per_tick * Settings.dt()
@@ -539,6 +993,7 @@ class Character(PhysicsEntity):
             self.velocity *= self.speed / abs(self.v)
 
     def get_damage(self, damager: Type["Character"]):
+        self.wake_up()
         if self.action_duration[Action.INVULNERABILITY] > 0:
             return
         self.stats.HP -= damager.damage
@@ -547,6 +1002,20 @@ class Character(PhysicsEntity):
     def apply_friction(self, friction_coefficient: float) -> None:
         super().apply_friction(friction_coefficient + self.friction_coeff)
 
+    @property
+    def total_friction_coeff(self) -> float:
+        return super().total_friction_coeff + self.friction_coeff
+
+    def get_render_key(self) -> tuple:
+        # шкала здоровья обновляется только при отрисовке
+        key = super().get_render_key()
+        return (self.HP / self.max_HP, id(self.__composite), key)
+
+    def get_bounding_rect(self) -> pg.Rect:
+        position = self.get_position() + self.__composite_offset
+        rect = pg.Rect(*position.pair(), *self.__composite.get_size())
+        return super().get_bounding_rect().union(rect)
+
     def update(
         self,
         screen_surface: pg.Surface,
@@ -554,11 +1023,13 @@ class Character(PhysicsEntity):
         zoom: float,
     ):
         self.HPbar.update_load(self.HP / self.max_HP)
-        super().update(
-            screen_surface=screen_surface,
-            convert_position=convert_position,
-            zoom=zoom,
-        )
+        if Settings.developer_mode:
+            Entity.update(self, screen_surface, convert_position, zoom)
+        # одно масштабирование и blit вместо отдельного для каждой части тела
+        size = Vector(*self.__composite.get_size()) * zoom
+        position = convert_position(self.get_position() + self.__composite_offset)
+        image = ScaledImageCache.get(self.__composite, size)
+        screen_surface.blit(image, position.pair())
         self.sub_elements.update(
             screen_surface=screen_surface,
             convert_position=convert_position,
@@ -567,7 +1038,12 @@ class Character(PhysicsEntity):
 
 
 class Player(Character, IEventProcessable):
-    def __init__(self, character_type: CharacterType, body, name="Player") -> None:
+    def __init__(
+        self,
+        character_type: Union[CharacterType, Type[CharacterType]],
+        body,
+        name="Player",
+    ) -> None:
         super().__init__(
             character_type=character_type,
             name=name,
@@ -584,9 +1060,9 @@ class Player(Character, IEventProcessable):
             for name, button in buttons.items():
                 self.buttons[button] = name
 
-    def process(self, entities: List[Type[PhysicsEntity]]):
+    def process(self):
         self.process_clamped_buttons()
-        super().process(entities)
+        super().process()
 
     def process_clamped_buttons(self):
         for name, _ in self.action_duration.items():
@@ -599,6 +1075,7 @@ class Player(Character, IEventProcessable):
         is_released = event.type == pg.KEYUP
         if is_pressed or is_released:
             if event.key in self.buttons:
+                self.wake_up()
                 name = self.buttons[event.key]
                 if is_pressed:
                     self.action_duration[name] += Settings.dt()
@@ -609,8 +1086,186 @@ class Player(Character, IEventProcessable):
 # ENTITY CONTROLLERS
 
 
+class IBroadphase(ABC):
+    """Широкая фаза поиска столкновений: отбирает кандидатов для точной проверки"""
+
+    @abstractmethod
+    def rebuild(self, entities: List[Type[Entity]]) -> None:
+        pass
+
+    @abstractmethod
+    def update(self, entity: Entity) -> None:
+        """Обновление положения сущности в индексе (после её перемещения)"""
+        pass
+
+    @abstractmethod
+    def remove(self, entity: Entity) -> None:
+        pass
+
+    @abstractmethod
+    def query_rect(self, rect: pg.Rect) -> List[Type[Entity]]:
+        """return: сущности, которые могут пересекаться с rect, в порядке добавления"""
+        pass
+
+    def query(self, entity: Entity) -> List[Type[Entity]]:
+        """return: сущности, которые могут пересекаться с entity"""
+        return self.query_rect(entity.rect)
+
+    @abstractmethod
+    def get_pairs(self) -> List[Tuple[Entity, Entity]]:
+        """return: пересекающиеся пары, каждая ровно один раз, в порядке добавления.
+        Поиск ведётся только от бодрствующих подвижных сущностей (is_awake),
+        поэтому пары из спящих и неподвижных сущностей не возвращаются"""
+        pass
+
+
+class BruteForceBroadphase(IBroadphase):
+    """Перебор всех сущностей, O(N^2) за тик. Оставлен для сравнения"""
+
+    def __init__(self) -> None:
+        self._entities: list[Entity] = []
+
+    def rebuild(self, entities: List[Type[Entity]]) -> None:
+        self._entities = list(entities)
+
+    def update(self, entity: Entity) -> None:
+        pass
+
+    def remove(self, entity: Entity) -> None:
+        if entity in self._entities:
+            self._entities.remove(entity)
+
+    def query_rect(self, rect: pg.Rect) -> List[Type[Entity]]:
+        return self._entities
+
+    def get_pairs(self) -> List[Tuple[Entity, Entity]]:
+        rects = [entity.rect for entity in self._entities]
+        pairs = []
+        for i, entity in enumerate(self._entities):
+            if not entity.is_awake:
+                continue
+            for j in entity.rect.collidelistall(rects):
+                other = self._entities[j]
+                if j > i or (j < i and not other.is_awake):
+                    pairs.append((i, j) if i < j else (j, i))
+        pairs.sort()
+        return [(self._entities[i], self._entities[j]) for i, j in pairs]
+
+
+class SpatialHashBroadphase(IBroadphase):
+    """Равномерная сетка: сущность хранится во всех ячейках, которые покрывает её rect"""
+
+    def __init__(self, cell_size: int = Settings.broadphase_cell_size) -> None:
+        assert cell_size > 0 and "размер ячейки должен быть положительным"
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], list[Entity]] = defaultdict(list)
+        self._entity_cells: dict[Entity, tuple[int, int, int, int]] = {}
+        # порядок добавления, чтобы кандидаты шли в том же порядке, что и в слое
+        self._order: dict[Entity, int] = {}
+        self._counter = 0
+
+    def _get_cells_range(self, rect: pg.Rect) -> Tuple[int, int, int, int]:
+        cs = self.cell_size
+        return (
+            rect.left // cs,
+            rect.top // cs,
+            max(rect.right - 1, rect.left) // cs,
+            max(rect.bottom - 1, rect.top) // cs,
+        )
+
+    def _insert(self, entity: Entity, cells_range: Tuple[int, int, int, int]):
+        x0, y0, x1, y1 = cells_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self._cells[(cx, cy)].append(entity)
+        self._entity_cells[entity] = cells_range
+
+    def _erase(self, entity: Entity):
+        x0, y0, x1, y1 = self._entity_cells.pop(entity)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self._cells[(cx, cy)]
+                cell.remove(entity)
+                if not cell:
+                    del self._cells[(cx, cy)]
+
+    def rebuild(self, entities: List[Type[Entity]]) -> None:
+        self._cells.clear()
+        self._entity_cells.clear()
+        self._order.clear()
+        self._counter = 0
+        for entity in entities:
+            self.update(entity)
+
+    def update(self, entity: Entity) -> None:
+        cells_range = self._get_cells_range(entity.rect)
+        if entity not in self._entity_cells:
+            self._order[entity] = self._counter
+            self._counter += 1
+        elif self._entity_cells[entity] == cells_range:
+            return
+        else:
+            self._erase(entity)
+        self._insert(entity, cells_range)
+
+    def remove(self, entity: Entity) -> None:
+        if entity in self._entity_cells:
+            self._erase(entity)
+            del self._order[entity]
+
+    def query_rect(self, rect: pg.Rect) -> List[Type[Entity]]:
+        x0, y0, x1, y1 = self._get_cells_range(rect)
+        candidates = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                candidates.update(self._cells.get((cx, cy), ()))
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def get_pairs(self) -> List[Tuple[Entity, Entity]]:
+        pairs = []
+        for entity, order in self._order.items():
+            if not entity.is_awake:
+                continue
+            for other in self.query(entity):
+                other_order = self._order[other]
+                if other_order == order or not entity.rect.colliderect(other.rect):
+                    continue
+                if other_order > order:
+                    pairs.append((entity, other))
+                elif not other.is_awake:
+                    pairs.append((other, entity))
+        pairs.sort(key=lambda pair: (self._order[pair[0]], self._order[pair[1]]))
+        return pairs
+
+
 class CollisionSystem:
 
+    @staticmethod
+    def create_broadphase(kind: str = None) -> IBroadphase:
+        """kind: "grid" или "brute_force", по умолчанию Settings.broadphase"""
+        kind = Settings.broadphase if kind is None else kind
+        if kind == "grid":
+            return SpatialHashBroadphase(Settings.broadphase_cell_size)
+        if kind == "brute_force":
+            return BruteForceBroadphase()
+        assert False and "неизвестный тип широкой фазы"
+
+    @staticmethod
+    def get_pair_pipeline(
+        obj1: PhysicsEntity, obj2: PhysicsEntity
+    ) -> List[Callable[..., None]]:
+        """Объединение конвейеров обоих объектов, каждый обработчик один раз"""
+        pipeline = obj1.get_collision_objs_pipeline()
+        for callback in obj2.get_collision_objs_pipeline():
+            if callback not in pipeline:
+                pipeline.append(callback)
+        return pipeline
+
+    @staticmethod
+    def handle_pair(obj1: PhysicsEntity, obj2: PhysicsEntity):
+        for callback in CollisionSystem.get_pair_pipeline(obj1, obj2):
+            callback(obj1, obj2)
+
     @staticmethod
     def handle_collision(obj1: PhysicsEntity, obj2: PhysicsEntity):
         """Обработка столкновения"""
@@ -631,8 +1286,11 @@ class CollisionSystem:
         new_velocity = lambda v1, m1, v2, m2: ((m1 - m2) * v1 + 2 * m2 * v2) / (m1 + m2)
         v1 = obj1.v
         v2 = obj2.v
-        obj1.velocity = new_velocity(v1, obj1.m, v2, obj2.m)
-        obj2.velocity = new_velocity(v2, obj2.m, v1, obj1.m)
+        # v1, v2 могут быть представлениями WorldStore, поэтому сначала вычисляю обе
+        new_v1 = new_velocity(v1, obj1.m, v2, obj2.m)
+        new_v2 = new_velocity(v2, obj2.m, v1, obj1.m)
+        obj1.velocity = new_v1
+        obj2.velocity = new_v2
 
     @staticmethod
     def _handle_movable_and_static_collision(
@@ -660,18 +1318,60 @@ class CollisionSystem:
             movable_obj.velocity.y *= -(1 - Settings.energy_absorption)
         movable_obj.shift_position(delta)
 
+    @staticmethod
+    def sweep(
+        start: Vector, size: Vector, delta: Vector, static_obj: PhysicsEntity
+    ) -> Tuple[float, str]:
+        """Swept AABB: прямоугольник размера size из положения start сдвигается на delta.
+        return: (доля сдвига до касания static_obj, ось касания "x" или "y")
+        или (None, None), если касания на этом сдвиге нет или они уже пересекаются"""
+        times = {}
+        for axis in ("x", "y"):
+            low = getattr(start, axis)
+            high = low + getattr(size, axis)
+            d = getattr(delta, axis)
+            if axis == "x":
+                s_low, s_high = static_obj.left, static_obj.right
+            else:
+                s_low, s_high = static_obj.top, static_obj.bottom
+            if d > 0:
+                times[axis] = ((s_low - high) / d, (s_high - low) / d)
+            elif d < 0:
+                times[axis] = ((s_high - low) / d, (s_low - high) / d)
+            elif low < s_high and s_low < high:
+                times[axis] = (-inf, inf)
+            else:
+                return None, None
+        entry_axis = "x" if times["x"][0] > times["y"][0] else "y"
+        entry = times[entry_axis][0]
+        exit_time = min(times["x"][1], times["y"][1])
+        if entry >= exit_time or not 0 <= entry <= 1:
+            return None, None
+        return entry, entry_axis
+
+    @staticmethod
+    def handle_continuous_collision(
+        movable_obj: PhysicsEntity, delta: Vector, time: float, axis: str
+    ):
+        """Возвращает объект, сдвинувшийся за шаг на delta, в точку касания
+        (доля time сдвига) и отражает скорость по оси касания, как при столкновении"""
+        movable_obj.shift_position(delta * (time - 1))
+        if axis == "x":
+            movable_obj.velocity.x *= -(1 - Settings.energy_absorption)
+        else:
+            movable_obj.velocity.y *= -(1 - Settings.energy_absorption)
+
     @staticmethod
     def handle_repulsion(obj1: PhysicsEntity, obj2: PhysicsEntity):
         """Применение силы отталкивания к объектам"""
         MIN_DISTANCE = 0.01
-        distance = max(abs(obj1.center - obj2.center), MIN_DISTANCE)
+        d_pos = obj1.center - obj2.center
+        distance = max(abs(d_pos), MIN_DISTANCE)
         intersection_coeff = max(Settings.repulsion_force / distance, 0.1)
 
-        direction_of_move = (obj1.center - obj2.center).get_normalization()
-        if abs(direction_of_move) == 0:
-            direction_of_move = Vector(1, 0)
-
-        d_pos = intersection_coeff * Settings.separation_speed * direction_of_move
+        if abs(d_pos.normalize()) == 0:
+            d_pos.set(1, 0)
+        d_pos *= intersection_coeff * Settings.separation_speed
         obj1.move(d_pos)
         obj2.move(-d_pos)
 
@@ -682,6 +1382,105 @@ class CollisionSystem:
             obj2.get_damage(obj1)
 
 
+class PhysicsSystem:
+    """Шаг физики: сначала движутся все сущности, затем каждая пара контактов
+    обрабатывается ровно один раз"""
+
+    def __init__(self, broadphase: IBroadphase = None, store=None) -> None:
+        """store - WorldStore для векторного шага, по умолчанию по Settings.use_world_store"""
+        if broadphase is None:
+            broadphase = CollisionSystem.create_broadphase()
+        if store is None and Settings.use_world_store:
+            # numpy нужен только для этого режима
+            from world_store import WorldStore
+
+            store = WorldStore()
+        self.broadphase = broadphase
+        self.store = store
+        self.pairs_count = 0
+        self.sleeping_count = 0
+
+    def remove(self, entity: PhysicsEntity) -> None:
+        """Вызывается при удалении сущности из мира"""
+        self.broadphase.remove(entity)
+        if self.store is not None and entity.store is self.store:
+            self.store.detach(entity)
+
+    def step(self, entities: List[Type[PhysicsEntity]]) -> None:
+        if self.store is not None:
+            for entity in entities:
+                if entity.store is None:
+                    self.store.attach(entity)
+        for entity in entities:
+            entity.process()
+        if self.store is not None:
+            self.store.step(Settings.dt())
+        self.broadphase.rebuild(entities)
+        if Settings.continuous_collisions:
+            self.handle_continuous_collisions(entities)
+        pairs = self.broadphase.get_pairs()
+        self.pairs_count = len(pairs)
+        # в каждой паре есть бодрствующее тело, контакт с ним будит спящее
+        for obj1, obj2 in pairs:
+            if obj1.is_sleeping:
+                obj1.wake_up()
+            if obj2.is_sleeping:
+                obj2.wake_up()
+        if self.store is None:
+            for obj1, obj2 in pairs:
+                CollisionSystem.handle_pair(obj1, obj2)
+        else:
+            # столкновения обрабатываются векторно, остальные обработчики - по парам
+            self.store.handle_collisions(pairs, Settings.dt())
+            for obj1, obj2 in pairs:
+                for callback in CollisionSystem.get_pair_pipeline(obj1, obj2):
+                    if callback is not CollisionSystem.handle_collision:
+                        callback(obj1, obj2)
+        self.update_sleep(entities)
+
+    def handle_continuous_collisions(self, entities: List[Type[PhysicsEntity]]) -> None:
+        """Тела, сдвинувшиеся за шаг больше чем на Settings.ccd_size_ratio своего размера,
+        проверяются на касание неподвижных сущностей вдоль всего пути (swept AABB),
+        иначе при большом шаге они могли бы проскочить тонкое препятствие"""
+        ratio = Settings.ccd_size_ratio
+        for entity in entities:
+            if not entity.is_awake or entity.previous_position is None:
+                continue
+            start = entity.previous_position
+            delta = entity.get_position() - start
+            size = entity.size
+            if abs(delta.x) <= size.x * ratio and abs(delta.y) <= size.y * ratio:
+                continue
+            swept_rect = pg.Rect(
+                min(start.x, start.x + delta.x),
+                min(start.y, start.y + delta.y),
+                size.x + abs(delta.x) + 1,
+                size.y + abs(delta.y) + 1,
+            )
+            first_time, first_axis = None, None
+            for other in self.broadphase.query_rect(swept_rect):
+                if other is entity or not other.is_static:
+                    continue
+                time, axis = CollisionSystem.sweep(start, size, delta, other)
+                if time is not None and (first_time is None or time < first_time):
+                    first_time, first_axis = time, axis
+            if first_time is not None:
+                CollisionSystem.handle_continuous_collision(
+                    entity, delta, first_time, first_axis
+                )
+                self.broadphase.update(entity)
+
+    def update_sleep(self, entities: List[Type[PhysicsEntity]]) -> None:
+        self.sleeping_count = 0
+        if not Settings.allow_sleeping:
+            return
+        for entity in entities:
+            if entity.is_awake:
+                entity.update_sleep()
+            if entity.is_sleeping:
+                self.sleeping_count += 1
+
+
 class Camera(Entity):
     """
     Класс обладающий областью видимости, который при помощи методов отображет объекты в ней.\\
@@ -705,6 +1504,13 @@ class Camera(Entity):
         self.world_position = Vector(0.0, 0.0)
         self.ratio_speed = 0.0
         self.tracked_entity: Entity = None
+        # статистика последнего кадра
+        self.drawn_count = 0
+        self.culled_count = 0
+        # положение (view) и нарисованные сущности прошлого кадра для get_dirty_rects
+        self.view = None
+        self._drawn_view = None
+        self._drawn: dict[int, tuple[pg.Rect, tuple]] = None
 
     def set_tracked_entity(self, entity: Entity, ratio_speed=0.0):
         assert (
@@ -714,31 +1520,157 @@ class Camera(Entity):
         self.tracked_entity = entity
 
     def set_zoom(self, new_zoom: float):
+        if new_zoom != self.zoom:
+            ScaledImageCache.clear()
         self.zoom = new_zoom
 
-    def render(self, screen_surface: pg.Surface, entities: List[Type[Entity]]) -> None:
+    def get_visible(
+        self,
+        entities: List[Type[Entity]],
+        spatial_index: "IBroadphase" = None,
+        alpha: float = 1.0,
+        static_cache: "StaticRenderCache" = None,
+    ) -> List[Tuple[Entity, Callable[[Vector], Vector], pg.Rect]]:
+        """Сдвигает камеру за отслеживаемой сущностью и отбирает сущности, попадающие
+        в её область: (сущность, преобразование позиции, прямоугольник на экране).
+        spatial_index - индекс сущностей слоя для быстрого отбора видимых,
+        alpha - доля шага физики, прошедшая после последнего шага (для интерполяции),
+        static_cache - заранее отрисованные неподвижные сущности: вместо них
+        отображаются фрагменты кэша"""
+        total_count = len(entities)
         position_on_camera = lambda position: position
+        offset = Vector(0, 0)
         if self.tracked_entity is not None:
             s = self.ratio_speed
             entity = self.tracked_entity
 
-            target_position = entity.get_position() + entity.size / 2
+            target_position = entity.center
+            shift = entity.get_interpolation_shift(alpha)
+            if shift is not None:
+                target_position = target_position + shift
             self.world_position = self.world_position * (1 - s) + target_position * s
             offset = (
                 self.get_position() + self.size / 2 - (self.zoom * self.world_position)
             )
-            position_on_camera = lambda position: (self.zoom * position) + offset
-
+            # камера сдвигается на целые пиксели, а позиции на экране округляются вниз:
+            # так кэш неподвижных сущностей (StaticChunk) и прямая отрисовка
+            # округляют одинаково
+            offset = Vector(floor(offset.x), floor(offset.y))
+            zoom = self.zoom
+            position_on_camera = lambda position: Vector(
+                floor(zoom * position.x + offset.x), floor(zoom * position.y + offset.y)
+            )
+            if spatial_index is not None:
+                entities = spatial_index.query_rect(self.get_world_rect(offset))
+        self.view = (offset.x, offset.y, self.zoom)
+        self.drawn_count = 0
+        if static_cache:
+            chunks = static_cache.get_chunks()
+            # неподвижные сущности рисуются под остальными
+            entities = chunks + [e for e in entities if not static_cache.has(e)]
+            total_count += len(chunks) - len(static_cache)
+
+        visible = []
+        for e in entities:
+            convert_position = position_on_camera
+            shift = e.get_interpolation_shift(alpha)
+            if shift is not None:
+                convert_position = lambda position, shift=shift: position_on_camera(
+                    position + shift
+                )
+            rect = self.get_screen_rect(e, convert_position)
+            if self.rect.colliderect(rect):
+                visible.append((e, convert_position, rect))
+        self.culled_count = total_count - len(visible)
+        return visible
+
+    def draw(
+        self,
+        screen_surface: pg.Surface,
+        visible: List[Tuple[Entity, Callable[[Vector], Vector], pg.Rect]],
+        clip: pg.Rect = None,
+    ) -> None:
+        """Отображает сущности, отобранные get_visible. Если задан clip,
+        рисуются только сущности, пересекающие эту область экрана"""
         # START render
-        screen_surface.set_clip(self.rect)
+        screen_surface.set_clip(self.rect if clip is None else self.rect.clip(clip))
 
-        # render entities
-        for e in entities:
-            e.update(screen_surface, position_on_camera, self.zoom)
+        # render entities (drawn_count сбрасывается в get_visible и суммируется
+        # по всем областям clip)
+        for e, convert_position, rect in visible:
+            if clip is None or clip.colliderect(rect):
+                e.update(screen_surface, convert_position, self.zoom)
+                self.drawn_count += 1
 
         # FINISH render
         screen_surface.set_clip(None)
 
+    def render(
+        self,
+        screen_surface: pg.Surface,
+        entities: List[Type[Entity]],
+        spatial_index: "IBroadphase" = None,
+        alpha: float = 1.0,
+        static_cache: "StaticRenderCache" = None,
+    ) -> None:
+        """Отображает только сущности, попадающие в область камеры"""
+        visible = self.get_visible(entities, spatial_index, alpha, static_cache)
+        self.draw(screen_surface, visible)
+
+    def get_dirty_rects(
+        self, visible: List[Tuple[Entity, Callable[[Vector], Vector], pg.Rect]]
+    ) -> Union[List[pg.Rect], None]:
+        """Области экрана, изменившиеся с прошлого вызова: старые и новые прямоугольники
+        сдвинутых, изменившихся, появившихся и исчезнувших сущностей.
+        None, если камера сдвинулась и нужна полная перерисовка"""
+        drawn = {id(e): (rect, e.get_render_key()) for e, _, rect in visible}
+        previous, self._drawn = self._drawn, drawn
+        previous_view, self._drawn_view = self._drawn_view, self.view
+        if previous is None or previous_view != self.view:
+            return None
+        dirty = []
+        for key, (rect, render_key) in drawn.items():
+            old = previous.pop(key, None)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] != rect or old[1] != render_key:
+                dirty.append(rect.union(old[0]))
+        dirty += [rect for rect, _ in previous.values()]
+        return dirty
+
+    def invalidate(self) -> None:
+        """Следующий вызов get_dirty_rects потребует полной перерисовки"""
+        self._drawn = None
+
+    def get_world_rect(self, offset: Vector) -> pg.Rect:
+        """Видимая область в координатах мира (с запасом Settings.culling_margin)"""
+        margin = Settings.culling_margin
+        top_left = (Vector(self.rect.x, self.rect.y) - offset) / self.zoom
+        size = self.size / self.zoom
+        return pg.Rect(
+            top_left.x - margin,
+            top_left.y - margin,
+            size.x + 2 * margin,
+            size.y + 2 * margin,
+        )
+
+    def get_screen_rect(
+        self, entity: Entity, convert_position: Callable[[Vector], Vector]
+    ) -> pg.Rect:
+        """Прямоугольник на экране, занимаемый сущностью вместе с подэлементами"""
+        rect = entity.get_bounding_rect()
+        position = convert_position(Vector(rect.x, rect.y))
+        size = Vector(rect.width, rect.height) * self.zoom
+        # запас компенсирует отбрасывание дробной части и в rect сущности,
+        # и в координатах при отрисовке
+        pad = 1 + self.zoom
+        return pg.Rect(
+            position.x - pad,
+            position.y - pad,
+            size.x + 2 * pad + 1,
+            size.y + 2 * pad + 1,
+        )
+
     @staticmethod
     def create_by_rect(rect: pg.Rect, name="Camera", zoom=1.0):
         position = Vector(rect.x, rect.y)
@@ -746,6 +1678,105 @@ class Camera(Entity):
         return Camera(size=size, position=position, name=name, zoom=zoom)
 
 
+class StaticChunk(Entity):
+    """Фрагмент StaticRenderCache: неподвижные сущности, отрисованные в одну поверхность"""
+
+    def __init__(self, position: Vector, size: Vector) -> None:
+        super().__init__(size, position, "StaticChunk")
+        self.entities: dict[int, Entity] = {}
+        self.version = 0  # меняется при каждом изменении набора сущностей
+        self._surface: pg.Surface = None
+        self._zoom: float = None
+
+    def add(self, entity: Entity) -> None:
+        self.entities[id(entity)] = entity
+        self._invalidate()
+
+    def remove(self, entity: Entity) -> None:
+        del self.entities[id(entity)]
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._surface = None
+        self.version += 1
+
+    def get_render_key(self) -> tuple:
+        return (self.version,)
+
+    def update(
+        self,
+        screen_surface: pg.Surface,
+        convert_position: Callable[[Vector], Vector],
+        zoom: float,
+    ):
+        if self._surface is None or zoom != self._zoom:
+            self._render(convert_position, zoom)
+        position_on_screen = convert_position(self.get_position())
+        screen_surface.blit(self._surface, position_on_screen.pair())
+
+    def _render(self, convert_position: Callable[[Vector], Vector], zoom: float):
+        # преобразование камеры - сдвиг и масштаб, поэтому положение на поверхности
+        # фрагмента - разность с положением фрагмента на экране
+        origin = convert_position(self.get_position())
+        size = convert_position(self.get_position() + self.size) - origin
+        self._surface = pg.Surface((ceil(size.x), ceil(size.y)), pg.SRCALPHA)
+        convert_on_chunk = lambda position: convert_position(position) - origin
+        for entity in self.entities.values():
+            entity.update(self._surface, convert_on_chunk, zoom)
+        if pg.display.get_surface() is not None:
+            self._surface = self._surface.convert_alpha()
+        self._zoom = zoom
+
+
+class StaticRenderCache:
+    """Заранее отрисованные неподвижные сущности слоя. Мир делится на квадратные
+    фрагменты со стороной Settings.static_chunk_size, каждый фрагмент - одна поверхность,
+    которая перерисовывается при добавлении/удалении его сущностей или смене zoom.
+    Сущности в кэше не должны двигаться и менять вид"""
+
+    def __init__(self, chunk_size: int = None) -> None:
+        self.chunk_size = chunk_size or Settings.static_chunk_size
+        # id(сущности) -> (сущность, ключи её фрагментов)
+        self._entities: dict[int, Tuple[Entity, List[Tuple[int, int]]]] = {}
+        self._chunks: dict[Tuple[int, int], StaticChunk] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def has(self, entity: Entity) -> bool:
+        return id(entity) in self._entities
+
+    def add(self, entity: Entity) -> None:
+        assert not self.has(entity) and "сущность уже в кэше"
+        keys = self._get_keys(entity.get_bounding_rect())
+        self._entities[id(entity)] = (entity, keys)
+        size = Vector(self.chunk_size, self.chunk_size)
+        for key in keys:
+            if key not in self._chunks:
+                position = Vector(key[0] * self.chunk_size, key[1] * self.chunk_size)
+                self._chunks[key] = StaticChunk(position, size)
+            self._chunks[key].add(entity)
+
+    def remove(self, entity: Entity) -> None:
+        _, keys = self._entities.pop(id(entity))
+        for key in keys:
+            chunk = self._chunks[key]
+            chunk.remove(entity)
+            if not chunk.entities:
+                del self._chunks[key]
+
+    def get_chunks(self) -> List[StaticChunk]:
+        return list(self._chunks.values())
+
+    def _get_keys(self, rect: pg.Rect) -> List[Tuple[int, int]]:
+        c = self.chunk_size
+        return [
+            (x, y)
+            for x in range(rect.left // c, (rect.right - 1) // c + 1)
+            for y in range(rect.top // c, (rect.bottom - 1) // c + 1)
+        ]
+
+
 class Layer(Model):
     """Контейнер для сущностей и камеры отображаемой их"""
 
@@ -754,6 +1785,35 @@ class Layer(Model):
         self._elements: list[Entity]
         self.z_index = z_index
         self.camera = camera
+        self.spatial_index: IBroadphase = None
+        self.static_cache = StaticRenderCache()
+
+    def add(self, element, is_static: bool = False):
+        """is_static - сущности не двигаются и не меняют вид:
+        они отрисовываются заранее в static_cache и отображаются его фрагментами"""
+        handles = super().add(element)
+        if is_static:
+            for entity in element if isinstance(element, Iterable) else [element]:
+                self.static_cache.add(entity)
+        return handles
+
+    def remove_by_handle(self, handle: int):
+        element = self.get_by_handle(handle)
+        super().remove_by_handle(handle)
+        if self.static_cache.has(element):
+            self.static_cache.remove(element)
+
+    def queue_add(self, element, is_static: bool = False):
+        """Отложенное добавление с тем же is_static, что и у add"""
+        super().queue_add((element, is_static))
+
+    def _add_queued(self, queued):
+        element, is_static = queued
+        self.add(element, is_static)
+
+    def set_spatial_index(self, spatial_index: IBroadphase):
+        """Индекс должен содержать все сущности слоя (например, широкая фаза физики)"""
+        self.spatial_index = spatial_index
 
     def set_tracked_entity(self, entity: Entity, speed=0.0):
         self.camera.set_tracked_entity(entity, speed)
@@ -761,8 +1821,57 @@ class Layer(Model):
     def set_zoom(self, new_zoom: float):
         self.camera.set_zoom(new_zoom)
 
-    def render(self, screen_surface: pg.Surface) -> None:
-        self.camera.render(screen_surface, self._elements)
+    def render(self, screen_surface: pg.Surface, alpha: float = 1.0) -> None:
+        self.camera.render(
+            screen_surface,
+            self.get_elements(),
+            self.spatial_index,
+            alpha,
+            self.static_cache,
+        )
+
+    def get_visible(
+        self, alpha: float = 1.0
+    ) -> List[Tuple[Entity, Callable[[Vector], Vector], pg.Rect]]:
+        return self.camera.get_visible(
+            self.get_elements(), self.spatial_index, alpha, self.static_cache
+        )
+
+
+class FrameStats:
+    """Время фаз кадра (мс) и счётчики. При enabled=False методы сразу возвращаются"""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.frames = 0
+        # текущий кадр
+        self.times: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self._starts: dict[str, float] = {}
+        # последний завершённый кадр
+        self.last_times: dict[str, float] = {}
+        self.last_counters: dict[str, int] = {}
+
+    def start(self, phase: str) -> None:
+        if self.enabled:
+            self._starts[phase] = perf_counter()
+
+    def stop(self, phase: str) -> None:
+        """Время повторяющейся за кадр фазы (например, шагов физики) суммируется"""
+        if self.enabled:
+            ms = (perf_counter() - self._starts.pop(phase)) * 1000
+            self.times[phase] = self.times.get(phase, 0.0) + ms
+
+    def count(self, name: str, value: int) -> None:
+        if self.enabled:
+            self.counters[name] = value
+
+    def new_frame(self) -> None:
+        if not self.enabled:
+            return
+        self.frames += 1
+        self.last_times, self.times = self.times, {}
+        self.last_counters, self.counters = self.counters, {}
 
 
 class Screen(IEventProcessable):
@@ -772,16 +1881,32 @@ class Screen(IEventProcessable):
         self.surface = surface
         self.display_area = display_area
         self.layers: dict[str, Layer] = {}
-        self.sorted_layers: list[str] = []
+        # очередь отрисовки: (z_index, имена слоёв с этим z_index), строится лениво
+        self._render_queue: list[tuple[int, list[str]]] = None
+        self.frame_stats = FrameStats()
 
     def add_layer(self, l_name: str, z_index: int = 1):
         camera = Camera.create_by_rect(self.display_area)
         self.layers[l_name] = Layer(camera, z_index)
-        tmp = sorted(self.layers.items(), key=lambda it: it[1].z_index)
-        self.sorted_layers = list(zip(*tmp))[0]
+        self._render_queue = None
 
-    def add_entities_on_layer(self, l_name: str, entities: Union[Entity, Iterable]):
-        self.layers[l_name].add(entities)
+    def get_render_queue(self) -> List[Tuple[int, List[str]]]:
+        """Слои, сгруппированные по z_index по возрастанию (внутри группы - по добавлению)"""
+        if self._render_queue is None:
+            groups: dict[int, list[str]] = defaultdict(list)
+            for l_name, layer in self.layers.items():
+                groups[layer.z_index].append(l_name)
+            self._render_queue = sorted(groups.items(), key=lambda it: it[0])
+        return self._render_queue
+
+    @property
+    def sorted_layers(self) -> List[str]:
+        return [l_name for _, l_names in self.get_render_queue() for l_name in l_names]
+
+    def add_entities_on_layer(
+        self, l_name: str, entities: Union[Entity, Iterable], is_static: bool = False
+    ):
+        self.layers[l_name].add(entities, is_static)
 
     def get_entities(self, l_name: str) -> List[Type[Entity]]:
         return self.layers[l_name].get_elements()
@@ -789,9 +1914,100 @@ class Screen(IEventProcessable):
     def set_tracked_entity(self, l_name: str, entity: Entity, speed=0.0):
         self.layers[l_name].set_tracked_entity(entity, speed)
 
-    def render(self) -> None:
+    def render(self, alpha: float = 1.0) -> None:
+        """alpha - доля шага физики для интерполяции положений (1 - без интерполяции)"""
+        stats = self.frame_stats
+        for l_name in self.sorted_layers:
+            if not stats.enabled:
+                self.layers[l_name].render(self.surface, alpha)
+                continue
+            stats.start(self._get_render_phase(l_name))
+            self.layers[l_name].render(self.surface, alpha)
+            stats.stop(self._get_render_phase(l_name))
+        self._count_layers()
+
+    def render_dirty(
+        self, background_color: Tuple[int], alpha: float = 1.0
+    ) -> Union[List[pg.Rect], None]:
+        """Перерисовывает только изменившиеся области экрана и возвращает их
+        для pg.display.update. None - экран перерисован полностью (камера сдвинулась,
+        изменений слишком много или был вызван invalidate), нужен pg.display.flip"""
+        stats = self.frame_stats
+        visible: dict[str, list] = {}
+        dirty = []
+        is_full = False
+        for l_name in self.sorted_layers:
+            layer = self.layers[l_name]
+            stats.start(self._get_render_phase(l_name))
+            visible[l_name] = layer.get_visible(alpha)
+            stats.stop(self._get_render_phase(l_name))
+            rects = layer.camera.get_dirty_rects(visible[l_name])
+            if rects is None:
+                is_full = True
+            else:
+                dirty += rects
+        dirty = self.merge_rects(dirty)
+        area = sum(rect.width * rect.height for rect in dirty)
+        max_area = Settings.dirty_rects_max_share * self.surface.get_width()
+        max_area *= self.surface.get_height()
+        if is_full or len(dirty) > Settings.dirty_rects_limit or area > max_area:
+            self.surface.fill(background_color)
+            for l_name in self.sorted_layers:
+                self._draw_layer(l_name, visible[l_name])
+            self._count_layers()
+            stats.count("dirty rects", -1)
+            return None
+        for rect in dirty:
+            self.surface.fill(background_color, rect)
+            for l_name in self.sorted_layers:
+                self._draw_layer(l_name, visible[l_name], rect)
+        self._count_layers()
+        stats.count("dirty rects", len(dirty))
+        return dirty
+
+    @staticmethod
+    def _get_layer_name(l_name) -> str:
+        # имена слоёв - обычно Enum
+        return getattr(l_name, "name", l_name)
+
+    def _get_render_phase(self, l_name) -> str:
+        return f"render {self._get_layer_name(l_name)}"
+
+    def _draw_layer(self, l_name, visible: list, clip: pg.Rect = None) -> None:
+        """Camera.draw слоя; время суммируется с get_visible в фазе render <слой>"""
+        self.frame_stats.start(self._get_render_phase(l_name))
+        self.layers[l_name].camera.draw(self.surface, visible, clip)
+        self.frame_stats.stop(self._get_render_phase(l_name))
+
+    def _count_layers(self) -> None:
+        if not self.frame_stats.enabled:
+            return
         for l_name in self.sorted_layers:
-            self.layers[l_name].render(self.surface)
+            name = self._get_layer_name(l_name)
+            camera = self.layers[l_name].camera
+            self.frame_stats.count(f"drawn {name}", camera.drawn_count)
+            self.frame_stats.count(f"culled {name}", camera.culled_count)
+
+    def merge_rects(self, rects: List[pg.Rect]) -> List[pg.Rect]:
+        """Объединяет пересекающиеся прямоугольники и обрезает их по поверхности"""
+        bounds = self.surface.get_rect()
+        merged: list[pg.Rect] = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if not rect.width or not rect.height:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect = rect.union(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def invalidate(self) -> None:
+        """Следующий render_dirty перерисует экран полностью
+        (например, после того как поверхность использовало меню)"""
+        for layer in self.layers.values():
+            layer.camera.invalidate()
 
     @abstractmethod
     def process_event(self, event: pg.event.Event):
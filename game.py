@@ -3,11 +3,12 @@ import pygame as pg
 import pygame_menu as pg_menu
 
 
-from engine import Character, Bar, Player, Screen, Obstacle, Entity
+from engine import Character, Bar, Player, Screen, Obstacle, Entity, PhysicsSystem
+from engine import FrameStats, PerformanceOverlay
 from config import Settings, MenuSetting, start_body
 from config import Colors, print_in_log_file
 from geometry.vector import Vector
-from character_type import RedBacteria, GreenBacteria, ChParts, CharacterTypeController
+from character_type import RedBacteria, GreenBacteria, ChParts, CharacterTypeCatalog
 from menu import Menu, DynamicMenu, FSM
 
 class GameScreen(Screen):
@@ -21,15 +22,17 @@ class GameScreen(Screen):
         # BackGround
         self.add_layer(self.LN.BG, 1)
         bg = Entity(Vector(w, h), Vector(i, i), self.LN.BG, Settings.bg_color)
-        self.add_entities_on_layer(self.LN.BG, bg)
+        self.add_entities_on_layer(self.LN.BG, bg, is_static=True)
 
         # MAP
         self.add_layer(self.LN.MAP, 2)
+        self.physics = PhysicsSystem()
+        self.layers[self.LN.MAP].set_spatial_index(self.physics.broadphase)
 
         self.player = player
-        CTC = CharacterTypeController(GreenBacteria())
+        parts = CharacterTypeCatalog.get(GreenBacteria).get_pasrts()
 
-        self.list_limit = {ch.name.lower(): len(CTC.get_all_parts()[ch])  for ch in ChParts}
+        self.list_limit = {ch.name.lower(): len(parts[ch])  for ch in ChParts}
         
         self.start_body = start_body  
         for name, i in self.start_body.items():
@@ -38,15 +41,15 @@ class GameScreen(Screen):
         self.add_entities_on_layer(self.LN.MAP, self.player)
         self.set_tracked_entity(self.LN.MAP, self.player, Settings.camera_speed)
 
-        enemy1 = Character(GreenBacteria(), name="enemy1")
+        enemy1 = Character(GreenBacteria, name="enemy1")
         enemy1.set_position(Vector(90, 20))
-        enemy2 = Character(RedBacteria(), name="enemy2")
+        enemy2 = Character(RedBacteria, name="enemy2")
         enemy2.set_position(Vector(80, 20))
         self.add_entities_on_layer(self.LN.MAP, [enemy1, enemy2])
 
         rect = Obstacle("images/tmp.png", name="rect")
         rect.set_position(Vector(100, 100))
-        self.add_entities_on_layer(self.LN.MAP, rect)
+        self.add_entities_on_layer(self.LN.MAP, rect, is_static=True)
 
         # INTERFACE
         # TODO: можно на камеру прямо навешивать, а не в отдельный слой выносить
@@ -58,6 +61,11 @@ class GameScreen(Screen):
         self.HPbar.update_load(0.8)
         self.add_entities_on_layer(self.LN.INTERFACE, self.HPbar)
 
+        self.frame_stats = FrameStats(enabled=Settings.developer_mode)
+        if self.frame_stats.enabled:
+            overlay = PerformanceOverlay(self.frame_stats, Vector(w - 160, 10))
+            self.add_entities_on_layer(self.LN.INTERFACE, overlay)
+
         self.set_camera_zoom(Settings.camera_zoom)
 
     def process_event(self, event: pg.event.Event):
@@ -78,10 +86,18 @@ class GameScreen(Screen):
                 self.process_event(event)
 
     def process_entities(self):
-        for entity in self.get_entities(self.LN.MAP):
-            entity.process(self.get_entities(self.LN.MAP))
+        layer = self.layers[self.LN.MAP]
+        entities = layer.get_elements()
+        self.physics.step(entities)
+        self.frame_stats.count("entities", len(entities))
+        self.frame_stats.count("pairs", self.physics.pairs_count)
+        self.frame_stats.count("sleeping", self.physics.sleeping_count)
+        for entity in entities:
             if not entity.is_exist:
-                self.layers[self.LN.MAP].remove(entity)
+                layer.queue_remove(entity)
+        # удаление погибших и добавление появившихся за тик
+        for entity in layer.flush():
+            self.physics.remove(entity)
         self.HPbar.update_load(self.player.HPbar.load)  # TODO: закастылил
 
     def set_camera_zoom(self, zoom: float):
@@ -90,13 +106,44 @@ class GameScreen(Screen):
             
     def display(self):
         self.game_ranning = True
+        accumulator = 0.0  # время кадров, ещё не отработанное физикой
+        Settings.FPS_clock.tick()  # не учитываем время, проведённое в меню
+        self.invalidate()  # меню рисовало поверх экрана
+        stats = self.frame_stats
         while self.game_ranning:
             Settings.FPS_clock.tick(Settings.FPS)
+            stats.new_frame()
+            accumulator += Settings.FPS_clock.get_time()
+            stats.start("events")
             self.event_tracking()
-            self.process_entities()
-            self.surface.fill(Colors.pink)
-            self.render()
-            pg.display.flip()
+            stats.stop("events")
+            substeps = 0
+            stats.start("physics")
+            while accumulator >= Settings.fixed_dt:
+                if substeps == Settings.max_substeps:
+                    # не догоняем отставание, иначе каждый кадр будет всё медленнее
+                    accumulator = 0.0
+                    break
+                self.process_entities()
+                accumulator -= Settings.fixed_dt
+                substeps += 1
+            stats.stop("physics")
+            stats.count("substeps", substeps)
+            alpha = accumulator / Settings.fixed_dt
+            stats.start("render")
+            if Settings.dirty_rects:
+                dirty_rects = self.render_dirty(Colors.pink, alpha)
+            else:
+                dirty_rects = None
+                self.surface.fill(Colors.pink)
+                self.render(alpha)
+            stats.stop("render")
+            stats.start("flip")
+            if dirty_rects is None:
+                pg.display.flip()
+            else:
+                pg.display.update(dirty_rects)
+            stats.stop("flip")
             
         self.status = 'Escape' 
 
@@ -116,11 +163,13 @@ class Game:
         self.screen_dict['Market'] = DynamicMenu(self, self.surface, MenuSetting.market_header, ChParts )
         
 
-        self.list_limit = {ch.name.lower(): len(CharacterTypeController(GreenBacteria()).get_all_parts()[ch])  for ch in ChParts}
+        CharacterTypeCatalog.build()
+        parts = CharacterTypeCatalog.get(GreenBacteria).get_pasrts()
+        self.list_limit = {ch.name.lower(): len(parts[ch])  for ch in ChParts}
     
 
     def init_game(self) -> None:
-        self.player = Player(GreenBacteria(), start_body, name="player")
+        self.player = Player(GreenBacteria, start_body, name="player")
         self.screen_dict['Game'] = GameScreen(self.player, self.surface )
       
 
@@ -2,8 +2,11 @@ import math
 
 
 class Vector:
+    __slots__ = ("x", "y")
+
     def __init__(self, x=0.0, y=0.0) -> None:
-        self.x, self.y = float(x), float(y)
+        self.x = x
+        self.y = y
 
     def __repr__(self):
         return "Vector({}, {})".format(self.x, self.y)
@@ -67,10 +70,31 @@ class Vector:
         return Vector(sign(self.x), sign(self.y))
 
     def get_normalization(self) -> "Vector":
-        if abs(self) > 0.0:
-            return Vector(self.x, self.y) / abs(self)
+        length = math.hypot(self.x, self.y)
+        if length > 0.0:
+            return Vector(self.x / length, self.y / length)
         return Vector()
 
+    # операции без создания новых векторов
+
+    def set(self, x: float, y: float) -> "Vector":
+        self.x = x
+        self.y = y
+        return self
+
+    def add_scaled(self, other: "Vector", scalar: float) -> "Vector":  # += other * scalar
+        self.x += other.x * scalar
+        self.y += other.y * scalar
+        return self
+
+    def normalize(self) -> "Vector":
+        """Нормирует на месте, нулевой вектор не меняется"""
+        length = math.hypot(self.x, self.y)
+        if length > 0.0:
+            self.x /= length
+            self.y /= length
+        return self
+
     def rotate(self, angle: float):
         a = self.x
         b = self.y
@@ -96,4 +120,4 @@ class Vector:
         return answer
 
     def pair(self):
-        return [self.x, self.y]
+        return (self.x, self.y)
@@ -3,7 +3,7 @@ import pygame as pg
 from abc import abstractmethod, ABC
 from dataclasses import dataclass
 
-from engine import  Screen
+from engine import  Screen, TextCache
 from config import MenuSetting, Settings, Action
 from typing import List, Dict, Type, Any
 
@@ -70,9 +70,7 @@ class Menu(Screen):
         self.draw_text(MenuSetting.cursor, 25, 100, (1 + self.position_cursor)*(int(self.surface.get_height()/(self.num_header+1))))
 
     def draw_text(self, text, size, x, y ):
-        pg.font.init()
-        font = pg.font.Font(MenuSetting.font, size)
-        text_surface = font.render(text, True, MenuSetting.color_text)
+        text_surface = TextCache.get(text, MenuSetting.font, size, MenuSetting.color_text)
         text_rect = text_surface.get_rect()
         text_rect.center = (x, y)
         self.surface.blit(text_surface, text_rect)
@@ -157,6 +155,11 @@ class DynamicMenu(Menu):
             index = self.game.player.body[change_part]             
             self.draw_text(header+' '+str(index), 20, 250, (1+header_index[header])*height_step)
 
+        # итоговые статы выбранного набора берутся из таблицы типа
+        stats = self.game.player.CTC.get_selected_stats()
+        stats_text = 'HP %d  damage %d  speed %.2f' % (stats.max_HP, stats.damage, stats.speed)
+        self.draw_text(stats_text, 14, 250, self.surface.get_height() - 25)
+
     
             
 
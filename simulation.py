@@ -0,0 +1,111 @@
+# симуляция мира без отображения (например, на сервере без дисплея)
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import random
+from time import perf_counter
+from typing import Iterable, Union
+
+from engine import Model, PhysicsEntity, PhysicsSystem, Character, Obstacle, IBroadphase
+from config import Settings, GameSettings
+from geometry.vector import Vector
+from character_type import CharacterTypeController
+
+
+class Simulation:
+    """Мир слоя MAP (персонажи, препятствия) без камеры, событий и отрисовки.
+    Каждый тик выполняется с фиксированным шагом dt"""
+
+    def __init__(
+        self, dt: float = None, broadphase: IBroadphase = None, store=None
+    ) -> None:
+        """dt - шаг (мс), по умолчанию текущий Settings.fixed_dt,
+        store - WorldStore для векторного шага (см. PhysicsSystem)"""
+        dt = Settings.fixed_dt if dt is None else dt
+        assert dt > 0 and "шаг симуляции должен быть положительным"
+        self.dt = dt
+        self.ticks = 0
+        self.entities = Model(elements_type=PhysicsEntity)
+        self.physics = PhysicsSystem(broadphase, store)
+
+    def add_entities(self, entities: Union[PhysicsEntity, Iterable]):
+        self.entities.add(entities)
+
+    def get_entities(self):
+        return self.entities.get_elements()
+
+    def populate(
+        self,
+        characters_count: int,
+        obstacles_count: int = 0,
+        map_size: Vector = Vector(2000, 2000),
+        seed: int = None,
+    ):
+        """Случайно расставляет персонажей всех типов и препятствия"""
+        rnd = random.Random(seed)
+        get_position = lambda: Vector(
+            rnd.uniform(0, map_size.x), rnd.uniform(0, map_size.y)
+        )
+        for i in range(characters_count):
+            character_type = rnd.choice(CharacterTypeController.CHARACTER_TYPES)
+            character = Character(character_type, name=f"character{i}")
+            character.set_position(get_position())
+            character.velocity = (
+                Vector(rnd.uniform(-1, 1), rnd.uniform(-1, 1)) * character.speed
+            )
+            self.add_entities(character)
+        for i in range(obstacles_count):
+            obstacle = Obstacle("images/tmp.png", name=f"obstacle{i}")
+            obstacle.set_position(get_position())
+            self.add_entities(obstacle)
+
+    def process_entities(self):
+        """Один тик с шагом self.dt"""
+        # сущности берут шаг из Settings.dt(), он подменяется только на время тика
+        prev_dt = GameSettings.fixed_dt
+        GameSettings.fixed_dt = self.dt
+        try:
+            entities = self.get_entities()
+            self.physics.step(entities)
+            for entity in entities:
+                if not entity.is_exist:
+                    self.entities.queue_remove(entity)
+            for entity in self.entities.flush():
+                self.physics.remove(entity)
+        finally:
+            GameSettings.fixed_dt = prev_dt
+        self.ticks += 1
+
+    def run(self, ticks: int) -> float:
+        """Выполняет ticks шагов, return: затраченное время в секундах"""
+        start = perf_counter()
+        for _ in range(ticks):
+            self.process_entities()
+        return perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Симуляция без отображения")
+    parser.add_argument("--characters", type=int, default=500)
+    parser.add_argument("--obstacles", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--dt", type=float, help="шаг (мс), по умолчанию fixed_dt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", action="store_true", help="массивы NumPy")
+    args = parser.parse_args()
+
+    store = None
+    if args.store:
+        from world_store import WorldStore
+
+        store = WorldStore()
+    simulation = Simulation(dt=args.dt, store=store)
+    simulation.populate(args.characters, args.obstacles, seed=args.seed)
+    elapsed = simulation.run(args.ticks)
+    print(
+        f"{args.ticks} ticks, {len(simulation.get_entities())} entities alive, "
+        f"{args.ticks / elapsed:.1f} ticks/sec"
+    )
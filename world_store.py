@@ -0,0 +1,292 @@
+# состояние физического мира в виде массивов NumPy (structure of arrays)
+from typing import List, Tuple
+
+import numpy as np
+
+from config import Settings
+from geometry.vector import Vector
+
+
+class VectorView(Vector):
+    """Вектор, координаты которого - строка массива (изменения пишутся в массив)"""
+
+    __slots__ = ("_row",)
+
+    def __init__(self, array: np.ndarray, index: int) -> None:
+        self._row = array[index]
+
+    @property
+    def x(self):
+        return float(self._row[0])
+
+    @x.setter
+    def x(self, value):
+        self._row[0] = value
+
+    @property
+    def y(self):
+        return float(self._row[1])
+
+    @y.setter
+    def y(self, value):
+        self._row[1] = value
+
+
+class WorldStore:
+    """Непрерывные массивы состояния PhysicsEntity.
+    Положения и скорости хранятся только здесь, присоединённая сущность служит
+    представлением своей строки. Размеры, массы и трение копируются из сущности
+    при присоединении и при их изменении (pull_entity_stats)"""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        assert capacity > 0 and "ёмкость должна быть положительной"
+        self.count = 0
+        self.entities: list = []
+        self.positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.sizes = np.zeros((capacity, 2))
+        self.masses = np.zeros(capacity)
+        self.friction = np.zeros(capacity)
+        self.movable = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.masses)
+
+    _ARRAYS = [
+        "positions",
+        "velocities",
+        "sizes",
+        "masses",
+        "friction",
+        "movable",
+    ]
+
+    def _grow(self):
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            new_array = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            new_array[: len(array)] = array
+            setattr(self, name, new_array)
+
+    def attach(self, entity) -> None:
+        """entity: PhysicsEntity, ещё не присоединённая к хранилищу"""
+        assert entity.store is None and "сущность уже присоединена к хранилищу"
+        if self.count == self.capacity:
+            self._grow()
+        index = self.count
+        position, velocity = entity.get_position(), entity.velocity
+        self.positions[index] = (position.x, position.y)
+        self.velocities[index] = (velocity.x, velocity.y)
+        self.entities.append(entity)
+        self.count += 1
+        entity.attach_store(self, index)
+        self.pull_entity_stats(entity)
+
+    def detach(self, entity) -> None:
+        """Перемещает последнюю строку на место удаляемой, O(1)"""
+        index = entity.store_index
+        assert self.entities[index] is entity and "сущность не из этого хранилища"
+        position, velocity = entity.get_position(), entity.velocity
+        entity.detach_store(
+            Vector(position.x, position.y), Vector(velocity.x, velocity.y)
+        )
+        last = self.count - 1
+        if index != last:
+            for name in self._ARRAYS:
+                array = getattr(self, name)
+                array[index] = array[last]
+            moved = self.entities[last]
+            self.entities[index] = moved
+            moved.store_index = index
+        self.entities.pop()
+        self.count -= 1
+
+    def pull_entity_stats(self, entity) -> None:
+        """Копирует размер, массу и трение сущности в массивы. Вызывается при
+        присоединении и при их изменении (set_size, смена части тела)"""
+        index = entity.store_index
+        self.sizes[index] = (entity.size.x, entity.size.y)
+        self.masses[index] = entity.m
+        self.friction[index] = entity.total_friction_coeff
+        self.movable[index] = entity.is_movable
+
+    def pull_stats(self) -> None:
+        """Копирует характеристики всех сущностей (если они менялись в обход
+        pull_entity_stats)"""
+        for entity in self.entities:
+            self.pull_entity_stats(entity)
+
+    def get_position(self, index: int) -> Vector:
+        # float, а не np.float64: координаты расходятся по rect, left, center и т.д.
+        x, y = self.positions[index].tolist()
+        return Vector(x, y)
+
+    def set_position(self, index: int, position: Vector) -> None:
+        self.positions[index] = (position.x, position.y)
+
+    def get_velocity(self, index: int) -> VectorView:
+        return VectorView(self.velocities, index)
+
+    def set_velocity(self, index: int, velocity: Vector) -> None:
+        self.velocities[index] = (velocity.x, velocity.y)
+
+    def step(self, dt: float) -> None:
+        """Векторизованные трение, ограничение скорости и интегрирование
+        (то же, что PhysicsEntity.apply_friction и PhysicsEntity.move)"""
+        n = self.count
+        movable = self.movable[:n]
+        velocities = self.velocities[:n]
+        positions = self.positions[:n]
+
+        # трение
+        friction = np.clip(self.friction[:n], 0, 1)
+        velocities[movable] *= (1 - friction[movable])[:, None]
+
+        # ограничиваю скорость снизу и сверху
+        speed = np.hypot(velocities[:, 0], velocities[:, 1])
+        moving = movable & (speed > Settings.error)
+        too_fast = moving & (speed > Settings.max_speed)
+        velocities[too_fast] *= (Settings.max_speed / speed[too_fast])[:, None]
+
+        # интегрирование
+        positions[moving] += velocities[moving] * dt
+        moved = np.flatnonzero(moving)
+        for index, (x, y) in zip(moved.tolist(), positions[moved].tolist()):
+            self.entities[index]._update_geometry(Vector(x, y))
+
+    def handle_collisions(self, pairs: List[Tuple], dt: float) -> None:
+        """pairs: пары присоединённых PhysicsEntity (см. BatchCollisionSystem)"""
+        first = np.fromiter((obj1.store_index for obj1, _ in pairs), int, len(pairs))
+        second = np.fromiter((obj2.store_index for _, obj2 in pairs), int, len(pairs))
+        BatchCollisionSystem.handle_collisions(self, first, second, dt)
+
+
+class BatchCollisionSystem:
+    """Векторная версия CollisionSystem.handle_collision для массивов пар индексов.
+    Пары с общей подвижной сущностью разносятся по последовательным раундам в исходном
+    порядке, поэтому результат совпадает с поочерёдной обработкой пар"""
+
+    @staticmethod
+    def split_into_rounds(
+        store: WorldStore, first: np.ndarray, second: np.ndarray
+    ) -> List[np.ndarray]:
+        """return: индексы пар для каждого раунда, внутри раунда подвижные не повторяются"""
+        rounds = np.empty(len(first), dtype=int)
+        last_round: dict[int, int] = {}  # неподвижные сущности не меняются парами
+        movable = store.movable.tolist()
+        for k, (i, j) in enumerate(zip(first.tolist(), second.tolist())):
+            r = 1 + max(
+                last_round.get(i, -1) if movable[i] else -1,
+                last_round.get(j, -1) if movable[j] else -1,
+            )
+            rounds[k] = r
+            if movable[i]:
+                last_round[i] = r
+            if movable[j]:
+                last_round[j] = r
+        order = np.argsort(rounds, kind="stable")
+        bounds = np.flatnonzero(np.diff(rounds[order])) + 1
+        return np.split(order, bounds)
+
+    @staticmethod
+    def handle_collisions(
+        store: WorldStore, first: np.ndarray, second: np.ndarray, dt: float
+    ) -> None:
+        """first[k], second[k] - индексы в store k-й пары"""
+        if len(first) == 0:
+            return
+        for pairs in BatchCollisionSystem.split_into_rounds(store, first, second):
+            BatchCollisionSystem._handle_round(store, first[pairs], second[pairs], dt)
+        for index in np.unique(np.concatenate([first, second])):
+            if store.movable[index]:
+                store.entities[index].update_rect()
+
+    @staticmethod
+    def _handle_round(store: WorldStore, i: np.ndarray, j: np.ndarray, dt: float):
+        movable = store.movable
+        active = movable[i] | movable[j]
+        i, j = i[active], j[active]
+        mi, mj = movable[i], movable[j]
+
+        # обе подвижные: упругий обмен скоростями
+        both = mi & mj
+        BatchCollisionSystem._handle_movables_collision(store, i[both], j[both])
+
+        # подвижная и неподвижная: выталкивание
+        one = mi ^ mj
+        m_ind = np.where(mi, i, j)[one]
+        s_ind = np.where(mi, j, i)[one]
+        BatchCollisionSystem._handle_movable_and_static_collision(store, m_ind, s_ind)
+
+        # отталкивание пересекающихся после коррекции
+        intersect = BatchCollisionSystem._collide_rects(store, i, j)
+        BatchCollisionSystem._handle_repulsion(store, i[intersect], j[intersect], dt)
+
+    @staticmethod
+    def _handle_movables_collision(store: WorldStore, i: np.ndarray, j: np.ndarray):
+        v1, v2 = store.velocities[i], store.velocities[j]
+        m1, m2 = store.masses[i][:, None], store.masses[j][:, None]
+        store.velocities[i] = ((m1 - m2) * v1 + 2 * m2 * v2) / (m1 + m2)
+        store.velocities[j] = ((m2 - m1) * v2 + 2 * m1 * v1) / (m2 + m1)
+
+    @staticmethod
+    def _handle_movable_and_static_collision(
+        store: WorldStore, m_ind: np.ndarray, s_ind: np.ndarray
+    ):
+        m_pos, m_size = store.positions[m_ind], store.sizes[m_ind]
+        s_pos, s_size = store.positions[s_ind], store.sizes[s_ind]
+        velocity = store.velocities[m_ind]
+        # вектор "вхождения" подвижного объекта в неподвижный
+        delta = np.zeros_like(m_pos)
+        for axis in range(2):
+            v = velocity[:, axis]
+            delta[:, axis] = np.where(
+                v > 0,
+                s_pos[:, axis] - (m_pos[:, axis] + m_size[:, axis]),
+                np.where(v < 0, (s_pos[:, axis] + s_size[:, axis]) - m_pos[:, axis], 0),
+            )
+        along_x = np.abs(delta[:, 0]) < np.abs(delta[:, 1])
+        delta[along_x, 1] = 0
+        delta[~along_x, 0] = 0
+        velocity[along_x, 0] *= -(1 - Settings.energy_absorption)
+        velocity[~along_x, 1] *= -(1 - Settings.energy_absorption)
+        store.velocities[m_ind] = velocity
+        store.positions[m_ind] = m_pos + delta
+
+    @staticmethod
+    def _collide_rects(store: WorldStore, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """То же, что pg.Rect.colliderect для rect сущностей"""
+        # rect хранит целые координаты и размеры
+        p1, s1 = np.trunc(store.positions[i]), np.trunc(store.sizes[i])
+        p2, s2 = np.trunc(store.positions[j]), np.trunc(store.sizes[j])
+        return np.all((p1 < p2 + s2) & (p2 < p1 + s1) & (s1 > 0) & (s2 > 0), axis=1)
+
+    @staticmethod
+    def _handle_repulsion(store: WorldStore, i: np.ndarray, j: np.ndarray, dt: float):
+        MIN_DISTANCE = 0.01
+        c1 = store.positions[i] + store.sizes[i] / 2
+        c2 = store.positions[j] + store.sizes[j] / 2
+        diff = c1 - c2
+        norm = np.hypot(diff[:, 0], diff[:, 1])
+        distance = np.maximum(norm, MIN_DISTANCE)
+        intersection_coeff = np.maximum(Settings.repulsion_force / distance, 0.1)
+
+        direction = np.zeros_like(diff)
+        direction[:, 0] = 1
+        nonzero = norm > 0
+        direction[nonzero] = diff[nonzero] / norm[nonzero][:, None]
+
+        d_pos = (intersection_coeff * Settings.separation_speed)[:, None] * direction
+        BatchCollisionSystem._move(store, i, d_pos, dt)
+        BatchCollisionSystem._move(store, j, -d_pos, dt)
+
+    @staticmethod
+    def _move(store: WorldStore, ind: np.ndarray, velocity: np.ndarray, dt: float):
+        """То же, что PhysicsEntity.move"""
+        speed = np.hypot(velocity[:, 0], velocity[:, 1])
+        moving = store.movable[ind] & (speed > Settings.error)
+        too_fast = speed > Settings.max_speed
+        velocity = velocity.copy()
+        velocity[too_fast] *= (Settings.max_speed / speed[too_fast])[:, None]
+        store.positions[ind[moving]] += velocity[moving] * dt